@@ -0,0 +1,42 @@
+# rows/sec of the single-row patient route vs the bulk route
+# Run from the project root: python -m benchmarks.bulk_insert
+# Uses DATABASE_URL if set, otherwise a throwaway SQLite file
+import time
+
+import benchmarks.env  # noqa: F401  (before main, it reads the environment on import)
+
+from fastapi.testclient import TestClient
+
+import main
+
+ROWS = 2000
+CREDENTIALS = {"username": "bench_admin", "password": "bench_password"}
+
+
+def patient(i: int):
+    return {"name": f"Patient {i}", "age": 20 + i % 60, "weight": 70, "height": 170}
+
+
+def run():
+    with TestClient(main.app) as client:
+        client.post("/admin/add", json=CREDENTIALS)
+        token = client.post("/admin/token", data=CREDENTIALS).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        start = time.perf_counter()
+        for i in range(ROWS):
+            assert client.post("/patients/patient/", json=patient(i)).status_code == 200
+        single = ROWS / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = client.post("/patients/bulk", json=[patient(i) for i in range(ROWS)])
+        assert response.status_code == 200
+        bulk = ROWS / (time.perf_counter() - start)
+
+    print(f"{'route':<28}{'rows/sec':>12}")
+    print(f"{'POST /patients/patient/':<28}{single:>12.0f}")
+    print(f"{'POST /patients/bulk':<28}{bulk:>12.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,13 @@
+# Environment shared by the benchmarks that start the app, import it before main
+# Uses DATABASE_URL if set (e.g. a local PostgreSQL), otherwise a throwaway SQLite file
+import os
+import tempfile
+
+if "DATABASE_URL" not in os.environ:
+    _db = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = "sqlite:///" + _db
+    os.environ.setdefault("ASYNC_DATABASE_URL", "sqlite+aiosqlite:///" + _db)
+
+# One client sending as fast as it can, measure the routes rather than the rate limiter
+os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
@@ -0,0 +1,41 @@
+# Import-time budget for main: measures `import main` in fresh interpreters
+# and checks that the model stack (pandas, scikit-learn) is not imported with it.
+# Run from the project root: python -m benchmarks.import_time  (exits 1 when over budget)
+import json
+import subprocess
+import sys
+
+# Seconds allowed for `import main` (best of RUNS), interpreter startup excluded
+IMPORT_BUDGET_SECONDS = 1.5
+RUNS = 5
+
+# Only loaded on the first prediction or during background warmup
+LAZY_MODULES = ("pandas", "sklearn")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run():
+    results = []
+    for _ in range(RUNS):
+        output = subprocess.run([sys.executable, "-c", PROBE], check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    best = min(result["seconds"] for result in results)
+    loaded = sorted({module for result in results for module in result["loaded"]})
+
+    print(f"import main: best {best:.3f}s of {RUNS} runs (budget {IMPORT_BUDGET_SECONDS:.1f}s)")
+    if loaded:
+        print(f"modules that should load lazily were imported: {', '.join(loaded)}")
+
+    return 0 if best <= IMPORT_BUDGET_SECONDS and not loaded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,55 @@
+# responses/sec of /patients/patients_list/{limit} at large limits, plus the serialization step alone:
+# jsonable_encoder + stdlib json (what a route without response_model does) vs response_model + orjson
+# Run from the project root: python -m benchmarks.list_serialization
+# Uses DATABASE_URL if set, otherwise a throwaway SQLite file
+import time
+
+import benchmarks.env  # noqa: F401  (before main, it reads the environment on import)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import main
+import schemas
+from database import SessionLocal
+
+ROWS = 10000
+LIMITS = (100, 1000, 10000)
+CREDENTIALS = {"username": "bench_admin", "password": "bench_password"}
+
+
+def rate(func, seconds: float = 2.0):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def run():
+    with TestClient(main.app) as client:
+        client.post("/admin/add", json=CREDENTIALS)
+        token = client.post("/admin/token", data=CREDENTIALS).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        client.post("/patients/bulk", json=[
+            {"name": f"Patient {i}", "age": 20 + i % 60, "weight": 70, "height": 170} for i in range(ROWS)
+        ])
+
+        print(f"{'limit':>8}{'route resp/sec':>18}{'jsonable+json /sec':>22}{'pydantic+orjson /sec':>24}")
+        with SessionLocal() as db:
+            for limit in LIMITS:
+                route = rate(lambda: client.get(f"/patients/patients_list/{limit}"))
+
+                patients = db.scalars(select(schemas.Patient).limit(limit)).all()
+                slow = rate(lambda: JSONResponse({"patients": jsonable_encoder(patients)}).body)
+                fast = rate(lambda: ORJSONResponse(
+                    schemas.PatientList(patients=patients).model_dump(mode="json")
+                ).body)
+                print(f"{limit:>8}{route:>18.1f}{slow:>22.1f}{fast:>24.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,69 @@
+# Login throughput and latency of an unrelated endpoint during a login storm,
+# with bcrypt run inline on the event loop (before) vs on the bcrypt thread pool (after)
+# Run from the project root: python -m benchmarks.login_storm
+# Uses DATABASE_URL if set, otherwise a throwaway SQLite file
+import asyncio
+import time
+
+import benchmarks.env  # noqa: F401  (before main, it reads the environment on import)
+
+import httpx
+
+import main
+from router import auth
+
+LOGINS = 40
+PINGS = 200
+CREDENTIALS = {"username": "bench_admin", "password": "bench_password"}
+
+
+async def inline_password_work(func, *args):
+    # The old behaviour: bcrypt runs directly on the event loop
+    return func(*args)
+
+
+def percentile(samples: list, q: float):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def storm(client: httpx.AsyncClient):
+    async def login():
+        response = await client.post("/admin/token", data=CREDENTIALS)
+        assert response.status_code == 200
+
+    async def ping(samples: list):
+        start = time.perf_counter()
+        await client.get("/")
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(login() for _ in range(LOGINS)),
+        *(ping(samples) for _ in range(PINGS)),
+    )
+    elapsed = time.perf_counter() - start
+    return LOGINS / elapsed, percentile(samples, 0.50), percentile(samples, 0.99)
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport does not send lifespan events, so run startup/shutdown here
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/admin/add", json=CREDENTIALS)
+
+            offloaded = auth.run_password_work
+            auth.run_password_work = inline_password_work
+            before = await storm(client)
+            auth.run_password_work = offloaded
+            after = await storm(client)
+
+    print(f"{'bcrypt':<10}{'logins/sec':>12}{'GET / p50 ms':>14}{'GET / p99 ms':>14}")
+    for name, (rate, p50, p99) in (("inline", before), ("offloaded", after)):
+        print(f"{name:<10}{rate:>12.1f}{p50:>14.1f}{p99:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+# Load time, memory per worker and prediction latency of the pickle model vs its joblib (mmap) export
+# Run from the project root: python -m benchmarks.model_format
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from model.export import export_model
+from model.predict import MODEL_PATH
+
+# Worker processes started at the same time per format, like uvicorn --workers
+WORKERS = 3
+PREDICTIONS = 300
+
+PROBE = """
+import json, sys, time
+
+def memory():
+    # Pss splits shared pages between the processes mapping them, so it is the fair per-worker figure
+    values = {}
+    for line in open('/proc/self/smaps_rollup'):
+        if line.startswith(('Rss:', 'Pss:', 'Shared_Clean:')):
+            key, value = line.split()[:2]
+            values[key.rstrip(':').lower()] = int(value) // 1024
+    return values
+
+start = time.perf_counter()
+import pandas, sklearn.ensemble
+from model.predict import load_model, predict_output
+imported = time.perf_counter()
+load_model(%(path)r)
+loaded = time.perf_counter()
+
+user_input = {'bmi': 24.6, 'age_group': 'adult', 'lifestyle_risk': 'low', 'city_tier': 1, 'income_lpa': 12.5, 'occupation': 'Engineer'}
+samples = []
+for _ in range(%(predictions)d):
+    t = time.perf_counter()
+    predict_output(user_input, %(path)r)
+    samples.append((time.perf_counter() - t) * 1000)
+samples.sort()
+
+# Stay alive until every worker has measured, so shared pages are counted as shared
+sys.stdout.write('ready\\n')
+sys.stdout.flush()
+sys.stdin.readline()
+print(json.dumps({
+    'import_s': imported - start,
+    'load_s': loaded - imported,
+    'p50_ms': samples[len(samples) // 2],
+    'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    **memory(),
+}))
+"""
+
+
+def measure(path: str):
+    probe = PROBE % {'path': path, 'predictions': PREDICTIONS}
+    workers = [
+        subprocess.Popen([sys.executable, '-c', probe], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        assert worker.stdout.readline().strip() == 'ready'
+    results = [json.loads(worker.communicate('\n')[0].strip().splitlines()[-1]) for worker in workers]
+
+    def average(key):
+        return sum(result[key] for result in results) / len(results)
+
+    return {key: average(key) for key in results[0]}
+
+
+def run():
+    target = os.path.join(tempfile.mkdtemp(), 'model.joblib')
+    export_model(MODEL_PATH, target)
+
+    rows = [('pickle', MODEL_PATH), ('joblib mmap', target)]
+    print(f"{WORKERS} workers per format, model file {os.path.getsize(MODEL_PATH) // 1024} KB\n")
+    print(f"{'format':<14}{'import s':>10}{'load s':>10}{'rss MB':>9}{'pss MB':>9}{'shared MB':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, path in rows:
+        r = measure(path)
+        print(f"{name:<14}{r['import_s']:>10.3f}{r['load_s']:>10.4f}{r['rss']:>9.0f}{r['pss']:>9.0f}"
+              f"{r['shared_clean']:>11.0f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,89 @@
+# p50/p99 latency of /insurance_premium/predict, old two-call DataFrame path vs current path
+# Run from the project root: python -m benchmarks.predict_latency
+import os
+import time
+
+# Every request must reach the model in this process: no prediction cache, no inference pool,
+# no micro-batching window added to both paths
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+os.environ.setdefault("MICRO_BATCH_WINDOW_MS", "0")
+
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import model.batcher as batcher
+import model.predict as predict
+from router import insurance
+
+REQUESTS = 500
+
+payload = {
+    "age": 35,
+    "weight": 75.5,
+    "height": 1.75,
+    "income_lpa": 12.5,
+    "smoker": False,
+    "city": "Mumbai",
+    "occupation": "Engineer"
+}
+
+
+def legacy_predict_output(user_input: dict, path: str = predict.MODEL_PATH):
+    # predict_output as it was before the single-pass path
+    model, class_labels = predict.load_model(path)
+    df = pd.DataFrame([user_input])
+    predicted_class = model.predict(df)[0]
+    probabilities = model.predict_proba(df)[0]
+    confidence = max(probabilities)
+    class_probs = dict(zip(class_labels, map(lambda p: round(p, 4), probabilities)))
+    return {
+        "predicted_category": predicted_class,
+        "confidence": round(confidence, 4),
+        "class_probabilities": class_probs
+    }
+
+
+def legacy_predict_batch(user_inputs: list, chunk_size: int = predict.BATCH_CHUNK_SIZE, path: str = predict.MODEL_PATH):
+    return [legacy_predict_output(user_input, path) for user_input in user_inputs]
+
+
+def percentile(samples: list, q: float):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def measure(client: TestClient):
+    # warm up
+    for _ in range(20):
+        client.post('/insurance_premium/predict', json=payload)
+
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.post('/insurance_premium/predict', json=payload)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return percentile(samples, 0.50), percentile(samples, 0.99)
+
+
+def main():
+    app = FastAPI()
+    app.include_router(insurance.router)
+    client = TestClient(app)
+
+    # The route reaches the model through the micro-batcher, so patch the functions it calls
+    current = batcher.predict_output, batcher.predict_batch
+    batcher.predict_output, batcher.predict_batch = legacy_predict_output, legacy_predict_batch
+    before = measure(client)
+    batcher.predict_output, batcher.predict_batch = current
+    after = measure(client)
+
+    print(f"{'path':<10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'before':<10}{before[0]:>10.2f}{before[1]:>10.2f}")
+    print(f"{'after':<10}{after[0]:>10.2f}{after[1]:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
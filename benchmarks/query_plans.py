@@ -0,0 +1,74 @@
+# EXPLAIN check: the hot queries must be answered from an index, never a full table scan
+# Run from the project root: python -m benchmarks.query_plans  (exits 1 when a query scans a table)
+# Migrates DATABASE_URL if set (e.g. a local PostgreSQL), otherwise a throwaway SQLite file
+import os
+import sys
+import tempfile
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "plans.db")
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+import schemas
+from database import engine, upgrade_schema
+from search import search_statement
+
+
+def hot_queries(dialect: str):
+    # The statements the routes send on every request, with placeholder values
+    queries = {
+        "patient by id": select(schemas.Patient).where(schemas.Patient.id == 1),
+        "patients page": select(schemas.Patient).where(schemas.Patient.id > 100).order_by(schemas.Patient.id).limit(100),
+        "admin login": select(schemas.Admin).where(schemas.Admin.username == "admin"),
+        "doctor by id": select(schemas.Doctor).where(schemas.Doctor.id == 1),
+        "patients by age": search_statement(
+            schemas.Patient, filters=(schemas.Patient.age >= 30, schemas.Patient.age <= 40), limit=20
+        )[0],
+        "doctors by specialty": search_statement(
+            schemas.Doctor, filters=(schemas.Doctor.specialty == "Cardiology",), limit=20
+        )[0],
+    }
+    if dialect == "postgresql":
+        # Only PostgreSQL has the trigram indexes
+        queries["patients by name prefix"] = search_statement(schemas.Patient, "ash", "prefix", limit=20)[0]
+        queries["doctors by similar name"] = search_statement(schemas.Doctor, "mehta", "fuzzy", limit=20)[0]
+    return queries
+
+
+def plan(connection, statement):
+    dialect = connection.dialect.name
+    sql = str(statement.compile(
+        dialect=postgresql.dialect() if dialect == "postgresql" else sqlite.dialect(),
+        compile_kwargs={"literal_binds": True},
+    ))
+    if dialect == "postgresql":
+        rows = connection.execute(text("EXPLAIN " + sql)).scalars().all()
+        return rows, any("Seq Scan" in row for row in rows)
+    rows = [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    # "SCAN patients" is a full scan, "SEARCH ... USING INDEX" / "USING INTEGER PRIMARY KEY" is not
+    return rows, any(row.startswith("SCAN") and "USING" not in row for row in rows)
+
+
+def run():
+    upgrade_schema()
+    failed = []
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # The tables are small here, make the planner show which index it would use at scale
+            connection.execute(text("SET enable_seqscan = off"))
+
+        for name, statement in hot_queries(connection.dialect.name).items():
+            rows, scans = plan(connection, statement)
+            print(f"{'FULL SCAN' if scans else 'ok':<10}{name}: {' | '.join(rows)}")
+            if scans:
+                failed.append(name)
+
+    if failed:
+        print(f"\nqueries without a usable index: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,250 @@
+# Latency/throughput suite: p50/p95/p99 and requests/sec per scenario, written to a JSON report
+# that can be diffed between commits.
+# Run from the project root:
+#   python -m benchmarks.suite --output before.json
+#   python -m benchmarks.suite --output after.json --compare before.json
+# Uses DATABASE_URL if set (e.g. a local PostgreSQL), otherwise a throwaway SQLite file
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import benchmarks.env  # noqa: F401  (before main, it reads the environment on import)
+
+import httpx
+
+import main
+from database import SQLALCHEMY_DATABASE_URL
+from model.predict import predict_output
+
+REQUESTS = 500
+CONCURRENCY = 16
+WARMUP = 20
+
+# bcrypt makes logins slow on purpose, so that scenario runs fewer requests
+LOGIN_REQUESTS = 50
+
+CREDENTIALS = {"username": "bench_admin", "password": "bench_password"}
+
+PAYLOAD = {
+    "age": 35,
+    "weight": 75.5,
+    "height": 1.75,
+    "income_lpa": 12.5,
+    "smoker": False,
+    "city": "Mumbai",
+    "occupation": "Engineer"
+}
+
+USER_INPUT = {
+    "bmi": 24.65,
+    "age_group": "adult",
+    "lifestyle_risk": "low",
+    "city_tier": 1,
+    "income_lpa": 12.5,
+    "occupation": "Engineer"
+}
+
+
+def percentile(samples: list, q: float):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def summarize(samples: list, elapsed: float, errors: int, concurrency: int):
+    samples = sorted(samples)
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "rps": round(len(samples) / elapsed, 1),
+    }
+
+
+async def measure(request, requests: int, concurrency: int):
+    """
+    Call request(i) for i in range(requests) from `concurrency` concurrent clients.
+    request returns the response, anything but 2xx counts as an error.
+    """
+    for i in range(WARMUP):
+        await request(requests + i)
+
+    samples = []
+    errors = 0
+    next_index = iter(range(requests))
+
+    async def client_loop():
+        nonlocal errors
+        for i in next_index:
+            start = time.perf_counter()
+            response = await request(i)
+            samples.append((time.perf_counter() - start) * 1000)
+            if not response.is_success:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - start, errors, concurrency)
+
+
+def measure_function(func, requests: int):
+    # In-process call, no HTTP or event loop involved
+    for _ in range(WARMUP):
+        func()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        call_start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - call_start) * 1000)
+    return summarize(samples, time.perf_counter() - start, 0, 1)
+
+
+async def run_scenarios(client: httpx.AsyncClient, requests: int, concurrency: int):
+    results = {}
+
+    def report(name: str, result: dict):
+        results[name] = result
+        print(f"{name:<26}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['rps']:>10.1f}{result['errors']:>8}")
+
+    print(f"{'scenario':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'errors':>8}")
+
+    report("predict_output", measure_function(lambda: predict_output(USER_INPUT), requests))
+
+    await client.post("/admin/add", json=CREDENTIALS)
+    report("admin_token", await measure(
+        lambda i: client.post("/admin/token", data=CREDENTIALS), min(requests, LOGIN_REQUESTS), concurrency
+    ))
+    token = (await client.post("/admin/token", data=CREDENTIALS)).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+
+    # A new income per request misses the prediction cache, the same payload hits it
+    report("predict_uncached", await measure(
+        lambda i: client.post("/insurance_premium/predict", json={**PAYLOAD, "income_lpa": 1 + i / 100}),
+        requests, concurrency
+    ))
+    report("predict_cached", await measure(
+        lambda i: client.post("/insurance_premium/predict", json=PAYLOAD), requests, concurrency
+    ))
+
+    patient_ids = {}
+    doctor_ids = {}
+
+    async def create_patient(i):
+        response = await client.post(
+            "/patients/patient/", json={"name": f"Patient {i}", "age": 20 + i % 60, "weight": 70, "height": 1.7}
+        )
+        if response.is_success:
+            patient_ids[i] = response.json()["id"]
+        return response
+
+    async def create_doctor(i):
+        response = await client.post("/doctors/doctor/", json={"name": f"Doctor {i}", "specialty": "General"})
+        if response.is_success:
+            doctor_ids[i] = response.json()["id"]
+        return response
+
+    report("patient_create", await measure(create_patient, requests, concurrency))
+    report("patient_get", await measure(
+        lambda i: client.get(f"/patients/patient/{patient_ids[i % requests]}"), requests, concurrency
+    ))
+    report("patient_update", await measure(
+        lambda i: client.put(
+            f"/patients/patient_id/{patient_ids[i % requests]}",
+            json={"name": f"Patient {i % requests}", "age": 40, "weight": 70, "height": 1.7},
+        ),
+        requests, concurrency
+    ))
+    report("patient_list", await measure(
+        lambda i: client.get("/patients/patients_list", params={"limit": 100}), requests, concurrency
+    ))
+    report("patient_delete", await measure(
+        lambda i: client.delete(f"/patients/patient_id/{patient_ids[i]}", params={"name": f"Patient {i}"}),
+        requests - WARMUP, concurrency
+    ))
+
+    report("doctor_create", await measure(create_doctor, requests, concurrency))
+    report("doctor_get", await measure(
+        lambda i: client.get(f"/doctors/doctor/{doctor_ids[i % requests]}"), requests, concurrency
+    ))
+    report("doctor_update", await measure(
+        lambda i: client.put(
+            f"/doctors/doctor_id/{doctor_ids[i % requests]}", json={"name": f"Doctor {i}", "specialty": "Surgery"}
+        ),
+        requests, concurrency
+    ))
+    report("doctor_delete", await measure(
+        lambda i: client.delete(f"/doctors/doctor_id/{doctor_ids[i]}"), requests - WARMUP, concurrency
+    ))
+
+    return results
+
+
+def metadata(requests: int, concurrency: int):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "database": SQLALCHEMY_DATABASE_URL.split(":", 1)[0],
+        "requests": requests,
+        "concurrency": concurrency,
+    }
+
+
+def compare(results: dict, baseline: dict):
+    print(f"\nchange vs {baseline['meta'].get('commit')} (negative latency / positive req/s is better)")
+    print(f"{'scenario':<26}{'p50':>9}{'p99':>9}{'req/s':>9}")
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<26}{change(result['p50_ms'], old['p50_ms']):>9}"
+              f"{change(result['p99_ms'], old['p99_ms']):>9}{change(result['rps'], old['rps']):>9}")
+
+
+async def run(requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport does not send lifespan events, so run startup/shutdown here
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_scenarios(client, requests, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency))
+    report = {"meta": metadata(args.requests, args.concurrency), "results": results}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    sys.exit(0 if all(result["errors"] == 0 for result in results.values()) else 1)
@@ -0,0 +1,76 @@
+# this is the file where we keep the bulk write helpers shared by the patient and doctor routers
+import csv
+import io
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+
+# Largest number of rows accepted by one bulk request
+MAX_BULK_ROWS = 10000
+
+
+def check_size(rows: list):
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} rows are allowed per bulk request")
+
+
+async def read_csv(file: UploadFile, schema):
+    """
+    Parse an uploaded CSV (header row = field names) into validated rows.
+    Returns (index, values) pairs for valid rows and "invalid" results for the rest.
+    """
+    content = (await file.read()).decode("utf-8-sig")
+    rows = []
+    errors = []
+    for index, record in enumerate(csv.DictReader(io.StringIO(content))):
+        try:
+            rows.append((index, schema.model_validate(record).model_dump()))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            errors.append({"index": index, "status": "invalid", "detail": detail})
+    return rows, errors
+
+
+async def bulk_create(db, model, rows: list, indexes: list = None):
+    # One multi-row INSERT ... RETURNING (batched by SQLAlchemy's insertmanyvalues) in one transaction
+    if not rows:
+        return []
+    result = await db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    ids = result.scalars().all()
+    await db.commit()
+
+    indexes = indexes if indexes is not None else range(len(rows))
+    return [{"index": index, "status": "created", "id": id} for index, id in zip(indexes, ids)]
+
+
+async def bulk_update(db, model, rows: list):
+    # One SELECT to find which ids exist, then one executemany UPDATE by primary key
+    if not rows:
+        return []
+    ids = {row["id"] for row in rows}
+    existing = set((await db.scalars(select(model.id).where(model.id.in_(ids)))).all())
+
+    found = [row for row in rows if row["id"] in existing]
+    if found:
+        await db.execute(update(model), found)
+    await db.commit()
+
+    return [
+        {"index": index, "status": "updated" if row["id"] in existing else "not_found", "id": row["id"]}
+        for index, row in enumerate(rows)
+    ]
+
+
+async def bulk_delete(db, model, ids: list):
+    # One DELETE ... WHERE id IN (...) RETURNING id
+    if not ids:
+        return []
+    result = await db.execute(delete(model).where(model.id.in_(set(ids))).returning(model.id))
+    deleted = set(result.scalars().all())
+    await db.commit()
+
+    return [
+        {"index": index, "status": "deleted" if id in deleted else "not_found", "id": id}
+        for index, id in enumerate(ids)
+    ]
@@ -0,0 +1,65 @@
+# this is the file where we map city names to the tier the model expects
+import json
+import os
+import re
+from types import MappingProxyType
+
+from database import tier_1_cities, tier_2_cities
+
+# Optional JSON file with extra entries: {"tiers": {"City": 1}, "aliases": {"Other Spelling": "City"}}
+CITY_TIERS_FILE = os.getenv("CITY_TIERS_FILE")
+
+# Cities that do not match anything are tier 3
+DEFAULT_CITY_TIER = 3
+
+# Common alternative names and old spellings, mapped to the name used in the tier lists
+CITY_ALIASES = {
+    "Bengaluru": "Bangalore",
+    "Bombay": "Mumbai",
+    "Calcutta": "Kolkata",
+    "Madras": "Chennai",
+    "New Delhi": "Delhi",
+    "Poona": "Pune",
+    "Baroda": "Vadodara",
+    "Benares": "Varanasi",
+    "Banaras": "Varanasi",
+    "Mysuru": "Mysore",
+    "Prayagraj": "Allahabad",
+    "Vizag": "Visakhapatnam",
+    "Trivandrum": "Thiruvananthapuram",
+    "Hubballi": "Hubli",
+    "Belagavi": "Belgaum",
+    "Calicut": "Kozhikode",
+    "Trichy": "Tiruchirappalli",
+}
+
+
+def normalize_city_name(name: str) -> str:
+    # "  new-delhi " and "New Delhi" give the same key
+    return " ".join(re.sub(r"[^\w]+", " ", name.casefold()).split())
+
+
+def build_city_index():
+    tiers = {city: 1 for city in tier_1_cities}
+    tiers.update({city: 2 for city in tier_2_cities})
+    aliases = dict(CITY_ALIASES)
+
+    if CITY_TIERS_FILE:
+        with open(CITY_TIERS_FILE, encoding="utf-8") as f:
+            extra = json.load(f)
+        tiers.update(extra.get("tiers", {}))
+        aliases.update(extra.get("aliases", {}))
+
+    index = {normalize_city_name(city): int(tier) for city, tier in tiers.items()}
+    for alias, city in aliases.items():
+        if normalize_city_name(city) in index:
+            index[normalize_city_name(alias)] = index[normalize_city_name(city)]
+    return MappingProxyType(index)
+
+
+# Built once at import, read-only afterwards
+CITY_TIER_INDEX = build_city_index()
+
+
+def get_city_tier(city: str) -> int:
+    return CITY_TIER_INDEX.get(normalize_city_name(city), DEFAULT_CITY_TIER)
@@ -0,0 +1,73 @@
+# this is the file where we configure the multi-process production server
+# Run: gunicorn main:app -c gunicorn.conf.py
+import gc
+import multiprocessing
+import os
+
+# Server processes, each one an event loop on its own core
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# The app (and the model, see when_ready) is loaded once in the master and shared
+# copy-on-write with the forked workers
+preload_app = True
+
+# Workers are recycled after this many requests (with jitter, so they do not all restart at once)
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# Seconds a worker gets to finish its requests on restart/shutdown before it is killed
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Read by database.py to split DB_MAX_CONNECTIONS over the workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Migrations run once in the master (see when_ready), not in every worker
+migrate_in_master = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+os.environ["DB_AUTO_MIGRATE"] = "0"
+
+# Each worker predicts in its own threadpool on the model inherited from the master,
+# instead of starting a process pool per worker
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+
+
+def when_ready(server):
+    # Runs in the master before the first fork
+    if migrate_in_master:
+        import database
+
+        try:
+            database.upgrade_schema()
+        except Exception:
+            server.log.exception("Database migration failed")
+        # The master's connections must not leak into the workers
+        database.engine.dispose()
+
+    if os.environ["INFERENCE_WORKERS"] == "0":
+        from model.predict import load_model
+        from model.registry import model_registry
+
+        load_model(model_registry.path(model_registry.active))
+        server.log.info("Model %s loaded in the master", model_registry.active)
+
+    # Keep the garbage collector from writing to (and so copying) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections must never be shared across processes
+    import database
+
+    database.engine.dispose(close=False)
+    if database.async_engine is not None:
+        database.async_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
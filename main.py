@@ -1,14 +1,84 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+import database
 from database import engine, get_db
-import schemas
+from record_cache import record_cache
+import metrics
+import ratelimit
+import tracing
+from model.executor import inference_executor
+from model.registry import model_registry
 from router import auth, patients, doctors, insurance
 
-# Create the database tables
-schemas.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Set DB_AUTO_MIGRATE=0 when `alembic upgrade head` runs as a separate deploy step
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
+# Set once the database schema is up to date
+schema_ready = False
+
+# Overlapping readiness probes must not run the migrations twice at the same time
+migration_lock = threading.Lock()
+
+
+def migrate_database():
+    # Apply the Alembic migrations (see migrations/)
+    global schema_ready
+    with migration_lock:
+        if schema_ready:
+            return
+        if DB_AUTO_MIGRATE:
+            database.upgrade_schema()
+        schema_ready = True
+
+
+async def warm_up_model():
+    try:
+        await inference_executor.warmup(model_registry.path(model_registry.active))
+    except Exception:
+        logger.exception("Model warmup failed, /health/ready will retry")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work runs here instead of at import, so importing main needs neither the DB nor the model
+    try:
+        await run_in_threadpool(migrate_database)
+    except SQLAlchemyError:
+        logger.exception("Could not migrate the database, /health/ready will retry")
+    warmup = asyncio.create_task(warm_up_model())
+
+    yield
+
+    warmup.cancel()
+    inference_executor.shutdown()
+    tracing.shutdown()
+    engine.dispose()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+
+# orjson renders every response body, much faster than the stdlib json encoder
+app = FastAPI(
+    title="Hospital Management System API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
-app = FastAPI(title="Hospital Management System API")
+# Load shedding and per-client rate limits, added first so the CORS middleware also wraps its 429/503s
+app.add_middleware(ratelimit.AdmissionMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,6 +89,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request counts, latency histograms and in-flight requests for /metrics
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Request spans (TRACING_EXPORTER) and per-request profiles for admins (PROFILING_ENABLED)
+if tracing.tracer is not None:
+    app.add_middleware(tracing.TracingMiddleware)
+if tracing.PROFILING_ENABLED:
+    app.add_middleware(tracing.ProfilingMiddleware)
+
 app.include_router(patients.router)
 app.include_router(doctors.router)
 app.include_router(auth.router)
@@ -30,6 +110,52 @@ def home():
     return {"message": "Hospital Management System API is Live!"}
 
 
+# liveness: the process is up and serving requests
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+
+def check_database():
+    if not schema_ready:
+        migrate_database()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+# readiness: the database is reachable and the model is loaded
+@app.get("/health/ready")
+async def readiness():
+    try:
+        await run_in_threadpool(check_database)
+        database_ok = True
+    except SQLAlchemyError:
+        database_ok = False
+
+    # A warmup that failed at startup is tried again, like the migrations
+    if not inference_executor.ready:
+        await warm_up_model()
+
+    checks = {"database": database_ok, "model": inference_executor.ready}
+    ready = all(checks.values())
+    return ORJSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
+
+
 @app.get("/check-connection")
 def check_db(db: Session = Depends(get_db)):
     return {"status": "Successfully connected to the database!"}
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    return record_cache.stats()
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,109 @@
+# this is the file where we collect the Prometheus metrics served on /metrics
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Set METRICS_ENABLED=0 to skip the per-request middleware
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# With several server processes, point this at an empty directory shared by them
+# so /metrics adds up all workers (prometheus_client multiprocess mode)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Buckets in seconds, from a cached prediction up to a slow login
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status code", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being handled", ["method"], multiprocess_mode="livesum"
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a connection from the pool", ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+INFERENCE_TIME = Histogram(
+    "model_inference_seconds", "Time the model function ran in the inference worker", ["function"],
+    buckets=LATENCY_BUCKETS,
+)
+INFERENCE_WAIT = Histogram(
+    "model_inference_queue_seconds", "Time between submitting to the inference pool and the model starting, "
+    "plus the trip back", ["function"], buckets=LATENCY_BUCKETS,
+)
+REJECTED = Counter(
+    "http_requests_rejected_total", "Requests turned away before reaching a route: rate_limit (429) or "
+    "overload (503)", ["reason", "limit"]
+)
+
+
+def observe_pool_checkout(engine: str, seconds: float):
+    POOL_CHECKOUT_WAIT.labels(engine).observe(seconds)
+
+
+def observe_inference(function: str, total: float, inference: float):
+    INFERENCE_TIME.labels(function).observe(inference)
+    INFERENCE_WAIT.labels(function).observe(max(total - inference, 0))
+
+
+def observe_rejection(reason: str, limit: str):
+    REJECTED.labels(reason, limit).inc()
+
+
+def render():
+    # Returns (body, content type) for the /metrics endpoint
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware overhead) that counts and times requests.
+    Routes are labelled with their path template, e.g. /patients/patient/{patient_id},
+    so the number of label values stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_PROGRESS.labels(method).dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(method, path).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, path, status).inc()
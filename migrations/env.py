@@ -0,0 +1,52 @@
+# this is the file where Alembic connects to the database and finds the models
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+import schemas
+from database import SQLALCHEMY_DATABASE_URL
+
+config = context.config
+
+# Leave the logging setup alone when the app runs the migrations on startup
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+# Used by `alembic revision --autogenerate` and `alembic check`
+target_metadata = schemas.Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The trigram (GIN) indexes only exist on PostgreSQL
+    if type_ == "index" and object.dialect_kwargs.get("postgresql_using") == "gin":
+        return context.get_context().dialect.name == "postgresql"
+    return True
+
+
+def run_migrations_offline():
+    # `alembic upgrade head --sql` prints the SQL instead of running it
+    context.configure(
+        url=SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # A separate engine without pooling, migrations may run while the app's pool is in use
+    connectable = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,63 @@
+"""Initial schema, as created by metadata.create_all before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created by create_all already have these tables: mark them with
+`alembic stamp 0001` instead of running this revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'patients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('age', sa.Integer(), nullable=True),
+        sa.Column('weight', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_patients_id', 'patients', ['id'])
+    op.create_index('ix_patients_name', 'patients', ['name'])
+
+    op.create_table(
+        'doctors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('specialty', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_doctors_id', 'doctors', ['id'])
+    op.create_index('ix_doctors_name', 'doctors', ['name'])
+    op.create_index('ix_doctors_specialty', 'doctors', ['specialty'])
+
+    op.create_table(
+        'admins',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('hashed_pass', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_index('ix_admins_id', 'admins', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('admins')
+    op.drop_table('doctors')
+    op.drop_table('patients')
@@ -0,0 +1,63 @@
+"""Indexes for the patient and doctor directory search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Trigram (pg_trgm) GIN indexes serve prefix and fuzzy name searches on
+PostgreSQL. The composite indexes serve the age range / specialty filters
+together with keyset pagination on id. On PostgreSQL all of them are built
+CONCURRENTLY, so large tables stay writable.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMPOSITE_INDEXES = (
+    ('ix_patients_age_id', 'patients', ['age', 'id']),
+    ('ix_doctors_specialty_id', 'doctors', ['specialty', 'id']),
+)
+TRIGRAM_INDEXES = (('ix_patients_name_trgm', 'patients'), ('ix_doctors_name_trgm', 'doctors'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, columns in COMPOSITE_INDEXES:
+            op.create_index(name, table, columns)
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in COMPOSITE_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table in TRIGRAM_INDEXES:
+            op.create_index(
+                name, table, ['name'],
+                postgresql_using='gin',
+                postgresql_ops={'name': 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, _ in COMPOSITE_INDEXES:
+            op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table in TRIGRAM_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        for name, table, _ in COMPOSITE_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,88 @@
+"""Drop indexes no query uses, unique index on admins.username, covering specialty index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+- ix_*_id duplicated the primary key indexes.
+- ix_patients_name / ix_doctors_name were plain btree indexes no query could
+  use: searches are case-insensitive (ILIKE) and served by the trigram indexes.
+- ix_doctors_specialty is covered by ix_doctors_specialty_id.
+- admins.username gets a named unique index instead of the anonymous UNIQUE constraint.
+- ix_doctors_specialty_id includes name on PostgreSQL, so specialty searches are index-only scans.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNUSED_INDEXES = (
+    ('ix_patients_id', 'patients', ['id']),
+    ('ix_patients_name', 'patients', ['name']),
+    ('ix_doctors_id', 'doctors', ['id']),
+    ('ix_doctors_name', 'doctors', ['name']),
+    ('ix_doctors_specialty', 'doctors', ['specialty']),
+    ('ix_admins_id', 'admins', ['id']),
+)
+
+
+def admins_table(unique_username: bool):
+    # Table definition used to rebuild admins on SQLite, which cannot drop a constraint in place
+    return sa.Table(
+        'admins', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(), unique=unique_username),
+        sa.Column('hashed_pass', sa.String()),
+    )
+
+
+def swap_specialty_index(include: list):
+    # PostgreSQL: build the replacement next to the old index and swap it in, so doctors stays writable
+    op.create_index(
+        'ix_doctors_specialty_id_new', 'doctors', ['specialty', 'id'],
+        postgresql_include=include, postgresql_concurrently=True, if_not_exists=True,
+    )
+    op.drop_index('ix_doctors_specialty_id', table_name='doctors', postgresql_concurrently=True, if_exists=True)
+    op.execute('ALTER INDEX ix_doctors_specialty_id_new RENAME TO ix_doctors_specialty_id')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        # DROP/CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, _ in UNUSED_INDEXES:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            swap_specialty_index(include=['name'])
+        op.drop_constraint('admins_username_key', 'admins', type_='unique')
+    else:
+        for name, table, _ in UNUSED_INDEXES:
+            op.drop_index(name, table_name=table)
+        with op.batch_alter_table('admins', recreate='always', copy_from=admins_table(unique_username=False)):
+            pass
+    op.create_index('ix_admins_username', 'admins', ['username'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.drop_index('ix_admins_username', table_name='admins')
+    if postgresql:
+        op.create_unique_constraint('admins_username_key', 'admins', ['username'])
+        with op.get_context().autocommit_block():
+            swap_specialty_index(include=[])
+            for name, table, columns in UNUSED_INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        with op.batch_alter_table('admins', recreate='always', copy_from=admins_table(unique_username=True)):
+            pass
+        for name, table, columns in UNUSED_INDEXES:
+            op.create_index(name, table, columns)
@@ -0,0 +1,37 @@
+"""Revoked refresh tokens table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Refresh token rotation and logout are recorded here instead of in each
+process, so every server worker sees them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
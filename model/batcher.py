@@ -0,0 +1,95 @@
+# this is the file where we group concurrent single predictions into one model call
+import asyncio
+import os
+
+from model.executor import inference_executor
+from model.predict import MODEL_PATH, predict_output, predict_batch
+
+# How long the first request of a batch waits for others to join, 0 disables batching
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "5"))
+
+# A batch is sent to the model as soon as it reaches this size
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent predictions for up to window_ms or max_size items,
+    runs them through one predict_proba call and hands each caller its row.
+    Requests for different model files are batched separately.
+    """
+
+    def __init__(self, window_ms: float, max_size: int):
+        self.window_ms = window_ms
+        self.max_size = max_size
+        self.batches = 0
+        self.items = 0
+        self._pending = {}
+        self._timer = None
+        self._tasks = set()
+
+    @property
+    def enabled(self):
+        return self.window_ms > 0 and self.max_size > 1
+
+    async def predict(self, user_input: dict, path: str = MODEL_PATH):
+        if not self.enabled:
+            return await inference_executor.run(predict_output, user_input, path)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(path, [])
+        pending.append((user_input, future))
+
+        if len(pending) >= self.max_size:
+            self._start(path, self._pending.pop(path))
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, {}
+        for path, batch in pending.items():
+            self._start(path, batch)
+
+    def _start(self, path: str, batch: list):
+        # Keep a reference so the task is not garbage collected mid-run
+        task = asyncio.ensure_future(self._run(path, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, path: str, batch: list):
+        self.batches += 1
+        self.items += len(batch)
+        user_inputs = [user_input for user_input, _ in batch]
+
+        try:
+            results = await inference_executor.run(predict_batch, user_inputs, len(user_inputs), path)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # The caller may have gone away (client disconnect) while waiting
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+        }
+
+
+micro_batcher = MicroBatcher(MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE)
@@ -0,0 +1,112 @@
+# this is the file where we cache predictions by the features the model actually sees
+import os
+import time
+from collections import OrderedDict
+
+from model.predict import FEATURE_COLUMNS, MODEL_PATH, model_key
+
+# Maximum number of cached predictions, 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+
+# Seconds a cached prediction stays valid
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+# Optional rounding of bmi / income_lpa before prediction, 0 keeps exact values
+PREDICTION_CACHE_BMI_STEP = float(os.getenv("PREDICTION_CACHE_BMI_STEP", "0"))
+PREDICTION_CACHE_INCOME_STEP = float(os.getenv("PREDICTION_CACHE_INCOME_STEP", "0"))
+
+
+def _quantize(value: float, step: float):
+    if step <= 0:
+        return value
+    return round(round(value / step) * step, 6)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a TTL, keyed on the model file (path and mtime) and the derived
+    feature tuple, so a prediction is never served for a model other than the one that made it,
+    even after a version's file is replaced on disk.
+    """
+
+    def __init__(self, max_size: int, ttl: float, bmi_step: float = 0, income_step: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.bmi_step = bmi_step
+        self.income_step = income_step
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def quantize(self, user_input: dict):
+        # The quantized values are also what the model is given,
+        # so a cached answer is exactly what a fresh prediction would return
+        if self.bmi_step <= 0 and self.income_step <= 0:
+            return user_input
+        user_input = dict(user_input)
+        user_input['bmi'] = _quantize(user_input['bmi'], self.bmi_step)
+        user_input['income_lpa'] = _quantize(user_input['income_lpa'], self.income_step)
+        return user_input
+
+    def model_file(self, path: str = MODEL_PATH):
+        # Looked up once per request and passed to get/set; None (file gone) skips the cache
+        try:
+            return model_key(path)
+        except OSError:
+            return None
+
+    def _key(self, user_input: dict, model_file: tuple):
+        return (*model_file, *(user_input[column] for column in FEATURE_COLUMNS))
+
+    def get(self, user_input: dict, model_file: tuple):
+        if not self.enabled or model_file is None:
+            return None
+
+        key = self._key(user_input, model_file)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, user_input: dict, prediction: dict, model_file: tuple):
+        if not self.enabled or model_file is None:
+            return
+
+        key = self._key(user_input, model_file)
+        self._entries[key] = (time.monotonic() + self.ttl, prediction)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+
+prediction_cache = PredictionCache(
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL,
+    PREDICTION_CACHE_BMI_STEP,
+    PREDICTION_CACHE_INCOME_STEP,
+)
@@ -0,0 +1,141 @@
+# this is the file where we run model inference outside the API process
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import observe_inference
+from tracing import span
+from model.predict import MODEL_PATH
+
+# Number of inference processes, 0 runs inference in the API threadpool instead
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# Requests allowed to wait for or run on the pool before new ones are rejected
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+
+# "spawn" starts clean workers; "fork" is faster to start but copies the API process
+INFERENCE_START_METHOD = os.getenv("INFERENCE_START_METHOD", "spawn")
+
+
+class InferenceBusy(Exception):
+    pass
+
+
+def _timed(func, *args):
+    # Runs in the worker, so the measured time is the model alone without queueing or pickling
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _init_worker(path: str):
+    # Unpickle the active model once per worker process
+    from model.predict import load_model
+    load_model(path)
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound prediction functions on a process pool so they
+    do not hold the GIL of the API process.
+    """
+
+    def __init__(self, workers: int, max_pending: int, start_method: str):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.start_method = start_method
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.ready = False
+        self.model_path = None
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.model_path or MODEL_PATH,),
+            )
+        return self._pool
+
+    async def run(self, func, *args):
+        # Reject early instead of letting the queue grow without bound
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise InferenceBusy(f"Inference queue is full ({self.max_pending} pending requests)")
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            with span("model.inference", function=func.__name__):
+                if self.workers <= 0:
+                    result, inference = await run_in_threadpool(_timed, func, *args)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result, inference = await loop.run_in_executor(self._get_pool(), _timed, func, *args)
+            observe_inference(func.__name__, time.perf_counter() - start, inference)
+            return result
+        except BrokenProcessPool:
+            # A worker died, start a fresh pool on the next request
+            self._pool = None
+            raise
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def preload(self, path: str = MODEL_PATH):
+        """
+        Load a model in every worker process,
+        or in this process when inference runs in the threadpool.
+        """
+        from model.predict import warm_up
+
+        if self.workers <= 0:
+            await run_in_threadpool(warm_up, path)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            try:
+                await asyncio.gather(*(loop.run_in_executor(pool, warm_up, path) for _ in range(self.workers)))
+            except BrokenProcessPool:
+                # e.g. the worker initializer could not load the model, the next call starts a fresh pool
+                if self._pool is pool:
+                    self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    async def warmup(self, path: str = MODEL_PATH):
+        """
+        Load the serving model ahead of the first request.
+        Workers started later (after a crash) load the same model,
+        so the path is only switched once the model loaded.
+        """
+        await self.preload(path)
+        self.model_path = path
+        self.ready = True
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+inference_executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_MAX_PENDING, INFERENCE_START_METHOD)
@@ -0,0 +1,32 @@
+# this is the file where we convert a pickled model into a memory-mappable joblib file
+# Run from the project root: python -m model.export [source.pkl] [target.joblib]
+import os
+import sys
+
+from model.predict import FEATURE_COLUMNS, MODEL_PATH, read_model
+
+
+def export_model(source: str = MODEL_PATH, target: str = None):
+    """
+    Write the model at source as an uncompressed joblib file
+    (compressed files cannot be memory-mapped) and check that it reads back.
+    """
+    import joblib
+
+    target = target or os.path.splitext(source)[0] + '.joblib'
+    model = read_model(source)
+
+    # Write next to the target and rename, so a server reloading the directory never sees half a file
+    partial = target + '.partial'
+    joblib.dump(model, partial)
+    os.replace(partial, target)
+
+    exported = read_model(target)
+    if exported.feature_names_in_.tolist() != FEATURE_COLUMNS or exported.classes_.tolist() != model.classes_.tolist():
+        raise RuntimeError(f"{target} does not match {source}")
+
+    return target
+
+
+if __name__ == '__main__':
+    print(export_model(*sys.argv[1:3]))
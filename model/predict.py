@@ -1,33 +1,122 @@
+import os
 import pickle
-import pandas as pd
+import threading
+from collections import OrderedDict
 
-# import the ml model
-with open('model/model1.pkl', 'rb') as f:
-    model = pickle.load(f)
+# Path of the bundled ml model, loaded on first use (see load_model).
+# A .joblib file written by `python -m model.export` is memory-mapped instead of unpickled
+MODEL_PATH = os.getenv("MODEL_PATH", "model/model1.pkl")
 
-# MLFlow
+# Model file formats load_model understands
+MODEL_EXTENSIONS = ('.pkl', '.joblib')
+
+# MLFlow (version name of the bundled model, other versions come from model/registry.py)
 MODEL_VERSION = '1.69.1'
 
-# Get class labels from model (important for matching probabilities to class names)
-class_labels = model.classes_.tolist()
+# Column order the model was trained with
+FEATURE_COLUMNS = ['bmi', 'age_group', 'lifestyle_risk', 'city_tier', 'income_lpa', 'occupation']
+
+# Number of rows sent to the model in one predict_proba call for batch requests
+BATCH_CHUNK_SIZE = 1000
+
+# Model files kept loaded per process, so switching back and forth between versions stays cheap
+MODELS_KEPT = 3
+
+# (path, mtime) -> (model, class_labels); pandas and scikit-learn are only imported on the first load
+_models = OrderedDict()
+_load_lock = threading.Lock()
+
+
+def read_model(path: str):
+    if path.endswith('.joblib'):
+        # NumPy arrays are mapped read-only from the file, so processes loading it share those pages
+        import joblib
+        return joblib.load(path, mmap_mode='r')
+
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def model_key(path: str = MODEL_PATH):
+    # Identifies the model a file holds right now, a file replaced on disk gets a new key
+    return path, os.path.getmtime(path)
+
+
+def load_model(path: str = MODEL_PATH):
+    """
+    Return (model, class_labels) for a model file, reading it on first use.
+    A file replaced on disk (new mtime) is loaded again.
+    """
+    key = model_key(path)
+
+    with _load_lock:
+        if key not in _models:
+            # import the ml model
+            loaded = read_model(path)
 
+            if loaded.feature_names_in_.tolist() != FEATURE_COLUMNS:
+                raise RuntimeError(f"{path} expects columns {loaded.feature_names_in_.tolist()}")
 
-def predict_output(user_input: dict):
+            # Get class labels from model (important for matching probabilities to class names)
+            _models[key] = (loaded, loaded.classes_.tolist())
+            while len(_models) > MODELS_KEPT:
+                _models.popitem(last=False)
 
-    df = pd.DataFrame([user_input])
+        _models.move_to_end(key)
+        return _models[key]
 
-    # Predict the class
-    predicted_class = model.predict(df)[0]
 
-    # Get probabilities for all classes
-    probabilities = model.predict_proba(df)[0]
-    confidence = max(probabilities)
+def warm_up(path: str = MODEL_PATH):
+    # Used to load the model in inference workers ahead of the first request
+    load_model(path)
+    return True
+
+
+def format_prediction(probabilities, class_labels: list):
+    # The predicted class is the one with the highest probability
+    best = probabilities.argmax()
 
     # Create mapping: {class_name: probability}
-    class_probs = dict(zip(class_labels, map(lambda p: round(p, 4), probabilities)))
+    class_probs = dict(zip(class_labels, map(lambda p: round(float(p), 4), probabilities)))
 
     return {
-        "predicted_category": predicted_class,
-        "confidence": round(confidence, 4),
+        "predicted_category": class_labels[best],
+        "confidence": round(float(probabilities[best]), 4),
         "class_probabilities": class_probs
     }
+
+
+def build_frame(user_inputs: list):
+    """
+    Build the model input from a column-ordered object array.
+    Much cheaper than letting pandas infer columns from a list of dicts.
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = np.array([[user_input[column] for column in FEATURE_COLUMNS] for user_input in user_inputs], dtype=object)
+    return pd.DataFrame(values, columns=FEATURE_COLUMNS, copy=False)
+
+
+def predict_output(user_input: dict, path: str = MODEL_PATH):
+
+    model, class_labels = load_model(path)
+
+    # One predict_proba call gives both the class and the probabilities
+    probabilities = model.predict_proba(build_frame([user_input]))[0]
+
+    return format_prediction(probabilities, class_labels)
+
+
+def predict_batch(user_inputs: list, chunk_size: int = BATCH_CHUNK_SIZE, path: str = MODEL_PATH):
+    """
+    Predict many inputs with one predict_proba call per chunk
+    instead of one DataFrame and two model calls per row.
+    """
+    model, class_labels = load_model(path)
+    results = []
+    for start in range(0, len(user_inputs), chunk_size):
+        df = build_frame(user_inputs[start:start + chunk_size])
+        for probabilities in model.predict_proba(df):
+            results.append(format_prediction(probabilities, class_labels))
+    return results
@@ -0,0 +1,247 @@
+# this is the file where we keep track of the model versions and which one serves traffic
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+
+from model.predict import MODEL_EXTENSIONS, MODEL_PATH, MODEL_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Directory scanned for extra model versions, each one a <version>.pkl or <version>.joblib file
+MODEL_DIR = os.getenv("MODEL_DIR", "model/versions")
+
+# Version serving traffic at startup, defaults to the bundled model
+MODEL_ACTIVE_VERSION = os.getenv("MODEL_ACTIVE_VERSION", MODEL_VERSION)
+
+# Optional candidate version and the fraction of /predict traffic it gets
+MODEL_CANDIDATE_VERSION = os.getenv("MODEL_CANDIDATE_VERSION") or None
+MODEL_CANDIDATE_FRACTION = float(os.getenv("MODEL_CANDIDATE_FRACTION", "0"))
+
+# "canary" answers the sampled requests with the candidate,
+# "shadow" answers with the active version and runs the candidate on the side
+MODEL_CANDIDATE_MODE = os.getenv("MODEL_CANDIDATE_MODE", "canary")
+
+# Serving state written by the model admin endpoints and followed by every server process,
+# so /models/activate and /models/candidate reach all gunicorn workers
+MODEL_STATE_FILE = os.getenv("MODEL_STATE_FILE", os.path.join(MODEL_DIR, "serving.json"))
+
+# Seconds between checks of MODEL_STATE_FILE for changes made in other processes
+MODEL_STATE_POLL_SECONDS = float(os.getenv("MODEL_STATE_POLL_SECONDS", "1"))
+
+# Latency samples kept per version for the percentiles
+LATENCY_SAMPLES = 1000
+
+CANDIDATE_MODES = ("canary", "shadow")
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+class VersionStats:
+    """
+    Request count, errors and recent latencies of one model version.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, latency_ms: float):
+        self.requests += 1
+        self.latencies.append(latency_ms)
+
+    def summary(self):
+        samples = sorted(self.latencies)
+
+        def percentile(q: float):
+            return round(samples[min(len(samples) - 1, int(len(samples) * q))], 3) if samples else 0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class ModelRegistry:
+    """
+    Maps version names to model files and decides which version answers a request.
+    Swapping versions only replaces a name: requests already running keep
+    the file they were routed to, so nothing in flight is dropped.
+    Changes are published to a state file that the other server processes poll (see sync).
+    """
+
+    def __init__(self, model_dir: str, active: str, candidate: str = None,
+                 fraction: float = 0, mode: str = "canary", state_file: str = None):
+        self.model_dir = model_dir
+        self.state_file = state_file
+        self.versions = {}
+        self.stats = {}
+        self.scan()
+
+        self.active = MODEL_VERSION
+        self.candidate = None
+        self.fraction = 0
+        self.mode = "canary"
+        self.activate(active)
+        if candidate is not None:
+            self.set_candidate(candidate, fraction, mode)
+
+        # Agreement between the active and shadow predictions
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+
+        # A state file published under other startup settings (e.g. a new MODEL_ACTIVE_VERSION
+        # deployed since) is ignored, so the environment wins after a configuration change
+        self.startup = self._serving()
+        self._state = None
+        self._next_sync = 0.0
+
+    def _serving(self):
+        return {"active": self.active, "candidate": self.candidate, "fraction": self.fraction, "mode": self.mode}
+
+    def _find_versions(self):
+        versions = {MODEL_VERSION: MODEL_PATH}
+        if os.path.isdir(self.model_dir):
+            for extension in MODEL_EXTENSIONS:
+                # Later extensions win, so an exported .joblib replaces the .pkl it came from
+                for name in sorted(os.listdir(self.model_dir)):
+                    if name.endswith(extension):
+                        versions[name[:-len(extension)]] = os.path.join(self.model_dir, name)
+        return versions
+
+    def scan(self):
+        # Build the new mapping first and swap it in with one assignment
+        versions = self._find_versions()
+
+        # The versions taking traffic must not disappear from under the router
+        for version in (getattr(self, "active", None), getattr(self, "candidate", None)):
+            if version is not None and version not in versions:
+                raise ModelNotFound(f"Model version {version} is in use but no longer in {self.model_dir}")
+
+        self.versions = versions
+        return sorted(versions)
+
+    def path(self, version: str):
+        try:
+            return self.versions[version]
+        except KeyError:
+            raise ModelNotFound(f"Unknown model version: {version}")
+
+    def activate(self, version: str):
+        self.path(version)
+        self.active = version
+        if self.candidate == version:
+            self.candidate = None
+            self.fraction = 0
+
+    def set_candidate(self, version: str = None, fraction: float = 0, mode: str = "canary"):
+        if mode not in CANDIDATE_MODES:
+            raise ValueError(f"Unknown candidate mode: {mode}")
+        if not 0 <= fraction <= 1:
+            raise ValueError("fraction must be between 0 and 1")
+        if version is not None:
+            self.path(version)
+        self.candidate = version
+        self.fraction = fraction if version is not None else 0
+        self.mode = mode
+
+    def publish(self):
+        """
+        Write the serving state for the other server processes,
+        they pick it up (and rescan MODEL_DIR) within MODEL_STATE_POLL_SECONDS.
+        """
+        if self.state_file is None:
+            return
+        state = {"startup": self.startup, **self._serving(), "published": time.time()}
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        # Written aside and renamed, so a reader never sees half a file
+        partial = f"{self.state_file}.{os.getpid()}.partial"
+        with open(partial, "w") as f:
+            json.dump(state, f)
+        os.replace(partial, self.state_file)
+        self._state = state
+
+    def sync(self, force: bool = False):
+        # Apply a serving state published by another process, checked at most every MODEL_STATE_POLL_SECONDS
+        now = time.monotonic()
+        if self.state_file is None or (now < self._next_sync and not force):
+            return
+        self._next_sync = now + MODEL_STATE_POLL_SECONDS
+
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state == self._state or state.get("startup") != self.startup:
+            return
+
+        versions = self._find_versions()
+        missing = [version for version in (state["active"], state["candidate"]) if version and version not in versions]
+        if missing:
+            logger.warning("Ignoring %s, model versions %s are not in %s", self.state_file, missing, self.model_dir)
+            return
+
+        self.versions = versions
+        self.active = state["active"]
+        self.candidate = state["candidate"]
+        self.fraction = state["fraction"]
+        self.mode = state["mode"]
+        self._state = state
+
+    def route(self):
+        """
+        Return (serving version, shadow version or None) for one request.
+        """
+        self.sync()
+        active, candidate = self.active, self.candidate
+        if candidate is None or candidate == active or random.random() >= self.fraction:
+            return active, None
+        if self.mode == "shadow":
+            return active, candidate
+        return candidate, None
+
+    def record(self, version: str, started: float, failed: bool = False):
+        stats = self.stats.setdefault(version, VersionStats())
+        if failed:
+            stats.errors += 1
+        else:
+            stats.record((time.perf_counter() - started) * 1000)
+
+    def compare(self, served: dict, shadow: dict):
+        self.shadow_compared += 1
+        if served["predicted_category"] == shadow["predicted_category"]:
+            self.shadow_agreed += 1
+
+    def status(self):
+        self.sync()
+        return {
+            "active": self.active,
+            "candidate": self.candidate,
+            "candidate_fraction": self.fraction,
+            "candidate_mode": self.mode,
+            "versions": {version: self.versions[version] for version in sorted(self.versions)},
+            "latency": {version: stats.summary() for version, stats in sorted(self.stats.items())},
+            "shadow": {
+                "compared": self.shadow_compared,
+                "agreement": round(self.shadow_agreed / self.shadow_compared, 4) if self.shadow_compared else 0,
+            },
+        }
+
+
+model_registry = ModelRegistry(
+    MODEL_DIR,
+    MODEL_ACTIVE_VERSION,
+    MODEL_CANDIDATE_VERSION,
+    MODEL_CANDIDATE_FRACTION,
+    MODEL_CANDIDATE_MODE,
+    MODEL_STATE_FILE,
+)
@@ -0,0 +1,176 @@
+# this is the file where we turn away requests early: token buckets per route and client, and load shedding
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi.responses import ORJSONResponse
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# "memory" (buckets per process), "redis" (shared by all workers and hosts, needs the redis package) or "none"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/0")
+
+# "<requests>/<seconds>" per client: a burst of <requests>, refilled evenly over <seconds>; "0" turns a limit off
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/60")
+RATE_LIMIT_PREDICT = os.getenv("RATE_LIMIT_PREDICT", "50/1")
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "0")
+
+# Clients tracked by the memory backend, the least recently seen are forgotten first
+RATE_LIMIT_CLIENTS = int(os.getenv("RATE_LIMIT_CLIENTS", "100000"))
+
+# Requests handled at once by one process, past that new ones get a 503 right away; 0 turns shedding off
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "200"))
+
+# Routes under each limit, every other route uses RATE_LIMIT_DEFAULT
+LIMITED_ROUTES = {
+    "login": ("/admin/token", "/admin/add"),
+    "predict": ("/insurance_premium/predict", "/insurance_premium/predict/batch"),
+}
+
+# Never limited, so probes and scrapes still answer while the server is overloaded
+EXEMPT_PATHS = ("/health/live", "/health/ready", "/metrics")
+
+
+def parse_limit(value: str):
+    # "10/60" -> (capacity 10, 1/6 token per second), "0" or "0/60" -> None
+    if value.strip() in ("", "0"):
+        return None
+    requests, _, seconds = value.partition("/")
+    capacity, period = int(requests), float(seconds or 1)
+    if capacity == 0:
+        return None
+    if capacity < 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}, expected <requests>/<seconds> with both above 0")
+    return capacity, capacity / period
+
+
+class MemoryBackend:
+    """
+    Token buckets in this process. With several workers each one keeps its own buckets,
+    so a client gets up to WEB_CONCURRENCY times the limit.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float):
+        # Returns 0 when a token was taken, otherwise the seconds until the next one
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisBackend:
+    """
+    Shared token buckets, refilled and taken atomically in a Lua script on the server's clock.
+    """
+
+    TAKE = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(self.TAKE)
+
+    async def take(self, key: str, capacity: int, rate: float):
+        try:
+            return float(await self._take(keys=[f"ratelimit:{key}"], args=[capacity, rate]))
+        except Exception:
+            # An unreachable limiter must not take the API down with it
+            logger.warning("Rate limit backend unavailable, letting the request through", exc_info=True)
+            return 0.0
+
+
+def create_backend(name: str):
+    if name == "memory":
+        return MemoryBackend(RATE_LIMIT_CLIENTS)
+    if name == "redis":
+        return RedisBackend(RATE_LIMIT_URL)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+class AdmissionMiddleware:
+    """
+    Plain ASGI middleware in front of the routes. Sheds load with a 503 once MAX_IN_FLIGHT
+    requests are running in this process, then answers 429 to clients (by IP) that
+    ran out of tokens for the route. Both carry Retry-After and never reach the app.
+    """
+
+    def __init__(self, app, backend=None, max_in_flight: int = MAX_IN_FLIGHT):
+        self.app = app
+        self.backend = create_backend(RATE_LIMIT_BACKEND) if backend is None else backend
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+        self.default_limit = parse_limit(RATE_LIMIT_DEFAULT)
+        limits = {"login": parse_limit(RATE_LIMIT_LOGIN), "predict": parse_limit(RATE_LIMIT_PREDICT)}
+        self.route_limits = {
+            path: (name, limits[name]) for name, paths in LIMITED_ROUTES.items() for path in paths
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            metrics.observe_rejection("overload", "")
+            response = ORJSONResponse(
+                status_code=503, content={"detail": "Server busy, try again shortly"}, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        name, limit = self.route_limits.get(scope["path"], ("default", self.default_limit))
+        if limit is not None and self.backend is not None:
+            # uvicorn puts the X-Forwarded-For address here for proxies in FORWARDED_ALLOW_IPS
+            client = scope["client"][0] if scope.get("client") else "unknown"
+            wait = await self.backend.take(f"{name}:{client}", *limit)
+            if wait > 0:
+                metrics.observe_rejection("rate_limit", name)
+                response = ORJSONResponse(
+                    status_code=429, content={"detail": "Too many requests"},
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,140 @@
+# this is the file where we cache patient and doctor lookups by id
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Server processes (set by gunicorn.conf.py)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# "memory" (per process LRU), "redis" (shared, needs the redis package) or "none".
+# With several processes a write only clears the memory cache of the process that handled it,
+# so the default is then "none"
+RECORD_CACHE_BACKEND = os.getenv("RECORD_CACHE_BACKEND", "memory" if WEB_CONCURRENCY <= 1 else "none")
+RECORD_CACHE_URL = os.getenv("RECORD_CACHE_URL", "redis://localhost:6379/0")
+
+# Maximum entries kept by the memory backend
+RECORD_CACHE_SIZE = int(os.getenv("RECORD_CACHE_SIZE", "10000"))
+
+# Seconds a cached record stays valid
+RECORD_CACHE_TTL = int(os.getenv("RECORD_CACHE_TTL", "300"))
+
+
+def as_dict(instance):
+    # Plain column values, so cached records never hold on to a session
+    return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+
+class MemoryBackend:
+    """
+    In-process LRU with a TTL. Each worker process has its own copy,
+    so writes in one worker only invalidate that worker's entries.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: dict, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisBackend:
+    """
+    Shared cache for several workers or hosts, works with any Redis-compatible server.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str):
+        value = await self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: dict, ttl: int):
+        await self._client.set(key, json.dumps(value), ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+
+class RecordCache:
+    """
+    Read-through cache in front of the by-id lookups, with hit/miss counters per entity.
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    async def get(self, entity: str, id: int):
+        if self.backend is None:
+            return None
+        value = await self.backend.get(f"{entity}:{id}")
+        if value is None:
+            self.misses[entity] += 1
+        else:
+            self.hits[entity] += 1
+        return value
+
+    async def set(self, entity: str, id: int, value: dict):
+        if self.backend is not None:
+            await self.backend.set(f"{entity}:{id}", value, self.ttl)
+
+    async def invalidate(self, entity: str, *ids: int):
+        if self.backend is not None:
+            await self.backend.delete(*(f"{entity}:{id}" for id in ids))
+
+    def stats(self):
+        stats = {}
+        for entity in sorted(set(self.hits) | set(self.misses)):
+            lookups = self.hits[entity] + self.misses[entity]
+            stats[entity] = {
+                "hits": self.hits[entity],
+                "misses": self.misses[entity],
+                "hit_rate": round(self.hits[entity] / lookups, 4) if lookups else 0,
+            }
+        return {"backend": RECORD_CACHE_BACKEND, "ttl_seconds": self.ttl, "entities": stats}
+
+
+def create_backend(name: str):
+    if name == "memory":
+        if WEB_CONCURRENCY > 1:
+            logger.warning(
+                "RECORD_CACHE_BACKEND=memory with %d processes: updates and deletes only clear the cache "
+                "of the process that handled them, other processes serve stale records for up to %ds",
+                WEB_CONCURRENCY, RECORD_CACHE_TTL,
+            )
+        return MemoryBackend(RECORD_CACHE_SIZE)
+    if name == "redis":
+        return RedisBackend(RECORD_CACHE_URL)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown RECORD_CACHE_BACKEND: {name}")
+
+
+record_cache = RecordCache(create_backend(RECORD_CACHE_BACKEND), RECORD_CACHE_TTL)
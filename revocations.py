@@ -0,0 +1,135 @@
+# this is the file where we remember revoked refresh tokens and login sessions
+import os
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+import database
+import schemas
+
+# "database" (revoked_tokens table, shared by all workers), "redis" (shared, needs the redis package)
+# or "memory" (this process only, for a single worker)
+REVOCATION_BACKEND = os.getenv("REVOCATION_BACKEND", "database")
+REVOCATION_URL = os.getenv("REVOCATION_URL", "redis://localhost:6379/0")
+
+# Seconds between deletes of entries whose token has expired anyway
+REVOCATION_PRUNE_INTERVAL = 60
+
+
+class MemoryBackend:
+    """
+    Revocations kept in this process. With several workers a token revoked
+    in one of them is still accepted by the others.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._last_prune = 0.0
+
+    async def revoke(self, key: str, expires_at: float):
+        # True when the key was not revoked before
+        now = time.time()
+        if now - self._last_prune > REVOCATION_PRUNE_INTERVAL:
+            self._last_prune = now
+            for expired in [key for key, exp in self._entries.items() if exp < now]:
+                del self._entries[expired]
+
+        if key in self._entries:
+            return False
+        self._entries[key] = expires_at
+        return True
+
+    async def is_revoked(self, key: str):
+        return key in self._entries
+
+
+class RedisBackend:
+    """
+    Shared revocations, each key expires in Redis together with its token.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+
+    async def revoke(self, key: str, expires_at: float):
+        # SET NX is atomic, so only one of two workers revoking the same key gets True
+        return bool(await self._client.set(f"revoked:{key}", 1, nx=True, exat=int(expires_at) + 1))
+
+    async def is_revoked(self, key: str):
+        return bool(await self._client.exists(f"revoked:{key}"))
+
+
+class DatabaseBackend:
+    """
+    Shared revocations in the revoked_tokens table (see migrations/). The primary key
+    makes a second revoke of the same key fail, which tells a reused token apart.
+    """
+
+    def __init__(self):
+        self._last_prune = 0.0
+
+    def _prune_due(self):
+        now = time.time()
+        if now - self._last_prune > REVOCATION_PRUNE_INTERVAL:
+            self._last_prune = now
+            return True
+        return False
+
+    def _revoke(self, key: str, expires_at: float):
+        with database.SessionLocal() as db:
+            if self._prune_due():
+                db.execute(delete(schemas.RevokedToken).where(schemas.RevokedToken.expires_at < time.time()))
+                db.commit()
+
+            db.add(schemas.RevokedToken(key=key, expires_at=expires_at))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+            return True
+
+    def _is_revoked(self, key: str):
+        with database.SessionLocal() as db:
+            return db.get(schemas.RevokedToken, key) is not None
+
+    async def revoke(self, key: str, expires_at: float):
+        if not database.DB_ASYNC:
+            return await run_in_threadpool(self._revoke, key, expires_at)
+
+        # With DB_ASYNC the sync engine keeps a single connection, the request pool is the async one
+        async with database.AsyncSessionLocal() as db:
+            if self._prune_due():
+                await db.execute(delete(schemas.RevokedToken).where(schemas.RevokedToken.expires_at < time.time()))
+                await db.commit()
+
+            db.add(schemas.RevokedToken(key=key, expires_at=expires_at))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                return False
+            return True
+
+    async def is_revoked(self, key: str):
+        if not database.DB_ASYNC:
+            return await run_in_threadpool(self._is_revoked, key)
+
+        async with database.AsyncSessionLocal() as db:
+            return await db.get(schemas.RevokedToken, key) is not None
+
+
+def create_backend(name: str):
+    if name == "database":
+        return DatabaseBackend()
+    if name == "redis":
+        return RedisBackend(REVOCATION_URL)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown REVOCATION_BACKEND: {name}")
+
+
+revocations = create_backend(REVOCATION_BACKEND)
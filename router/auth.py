@@ -1,7 +1,14 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
@@ -9,13 +16,33 @@ from pydantic import BaseModel, Field
 from starlette import status
 import bcrypt
 import schemas
-from database import get_db
+from database import get_async_db
+from revocations import revocations
 
 
 # --- Configuration ---
 SECRET_KEY = "YOUR_SECRET_KEY" # Replace with your actual secret key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "20"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+# bcrypt cost factor for new hashes (existing hashes keep the cost they were made with)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Password hashes/checks allowed to run at the same time, the rest wait their turn
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "4"))
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt")
+
+# "jose" (python-jose) or "pyjwt" (faster verification, needs the PyJWT package)
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+
+# Verified tokens remembered until they expire, so repeat requests skip the signature check (0 disables)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+if JWT_BACKEND == "pyjwt":
+    import jwt as pyjwt
 
 
 # Setup Auth
@@ -35,6 +62,10 @@ class AdminCreate(BaseModel):
     password: str = Field(..., min_length=8, max_length=72)
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 def pass_hash_converter(password: str):
     """
     Hashes the password using bcrypt directly.
@@ -43,7 +74,7 @@ def pass_hash_converter(password: str):
     # Convert to bytes and truncate to 72 bytes
     password_bytes = password.encode('utf-8')[:72]
     # Generate salt and hash
-    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
+    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
     # Return as string for database storage
     return hashed.decode('utf-8')
 
@@ -61,11 +92,17 @@ def verify_password(password: str, hash_pass: str):
     return bcrypt.checkpw(password_bytes, hash_bytes)
 
 
-def authenticate_admin(admin_username: str, password: str, db: Session):
-    admin = db.query(schemas.Admin).filter(schemas.Admin.username == admin_username).first()
+async def run_password_work(func, *args):
+    # Runs pass_hash_converter / verify_password on the bcrypt thread pool
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, func, *args)
+
+
+async def authenticate_admin(admin_username: str, password: str, db: AsyncSession):
+    admin = await db.scalar(select(schemas.Admin).where(schemas.Admin.username == admin_username))
     if not admin:
         return False
-    if not verify_password(password, admin.hashed_pass):
+    if not await run_password_work(verify_password, password, admin.hashed_pass):
         return False
     return admin
 
@@ -80,16 +117,86 @@ def create_access_token(username: str, expires_delta: Optional[timedelta] = None
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_refresh_token(username: str, family: Optional[str] = None):
+    # jti identifies this token, fam the login session it was rotated from
+    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    encode = {
+        "sub": username,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
+        "exp": expire,
+    }
+    return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def issue_tokens(username: str, family: Optional[str] = None):
+    return {
+        "access_token": create_access_token(username, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)),
+        "refresh_token": create_refresh_token(username, family),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def decode_refresh_token(token: str):
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        raise get_user_exception()
+    if payload.get("type") != "refresh" or not payload.get("sub"):
+        raise get_user_exception()
+    return payload
+
+
+def decode_token(token: str):
+    """
+    Verify the signature and expiry of a token and return its payload.
+    Raises JWTError whichever backend is used.
+    """
+    if JWT_BACKEND == "pyjwt":
+        try:
+            return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except pyjwt.PyJWTError as e:
+            raise JWTError(str(e))
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+# token -> (exp timestamp, user), least recently used first
+verified_tokens = OrderedDict()
+
+
+def cache_verified_token(token: str, exp, user: dict):
+    # Tokens without an expiry are never cached
+    if TOKEN_CACHE_SIZE <= 0 or exp is None:
+        return
+    verified_tokens[token] = (exp, user)
+    verified_tokens.move_to_end(token)
+    while len(verified_tokens) > TOKEN_CACHE_SIZE:
+        verified_tokens.popitem(last=False)
+
+
 async def get_current_user(token: str = Depends(oauth2_bearer)):
+    cached = verified_tokens.get(token)
+    if cached is not None:
+        if cached[0] > time.time():
+            verified_tokens.move_to_end(token)
+            return cached[1]
+        del verified_tokens[token]
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
-        if username is None:
+        # Refresh tokens only work on /admin/refresh
+        if username is None or payload.get("type") == "refresh":
             raise get_user_exception()
-        return {"username": username}
     except JWTError:
         raise get_user_exception()
 
+    user = {"username": username}
+    cache_verified_token(token, payload.get("exp"), user)
+    return user
+
 
 # --- Exceptions ---
 def token_exception():
@@ -111,10 +218,10 @@ def get_user_exception():
 
 
 @router.post("/add")
-async def create_newadmin(newadmin: AdminCreate, db: Session = Depends(get_db)):
+async def create_newadmin(newadmin: AdminCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         # Check if admin already exists
-        existing_admin = db.query(schemas.Admin).filter(schemas.Admin.username == newadmin.username).first()
+        existing_admin = await db.scalar(select(schemas.Admin).where(schemas.Admin.username == newadmin.username))
         if existing_admin:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -124,10 +231,10 @@ async def create_newadmin(newadmin: AdminCreate, db: Session = Depends(get_db)):
         admin_value = schemas.Admin()
         admin_value.username = newadmin.username
         # Hash password correctly
-        admin_value.hashed_pass = pass_hash_converter(newadmin.password)
+        admin_value.hashed_pass = await run_password_work(pass_hash_converter, newadmin.password)
 
         db.add(admin_value)
-        db.commit()
+        await db.commit()
 
         return {
             "message": "Admin user created successfully",
@@ -142,12 +249,37 @@ async def create_newadmin(newadmin: AdminCreate, db: Session = Depends(get_db)):
 
 @router.post("/token")
 async def get_token(form_data: OAuth2PasswordRequestForm = Depends(),
-                    db: Session = Depends(get_db)):
-    admin = authenticate_admin(form_data.username, form_data.password, db)
+                    db: AsyncSession = Depends(get_async_db)):
+    admin = await authenticate_admin(form_data.username, form_data.password, db)
     if not admin:
         raise token_exception()
 
-    token_expires = timedelta(minutes=20)
-    token = create_access_token(admin.username, expires_delta=token_expires)
+    return issue_tokens(admin.username)
+
+
+@router.post("/refresh")
+async def refresh_access_token(body: RefreshRequest):
+    """
+    Swap a refresh token for a new access/refresh pair without a password check.
+    Each refresh token works once (rotation).
+    """
+    payload = decode_refresh_token(body.refresh_token)
+    jti, family = payload.get("jti"), payload.get("fam")
+
+    if await revocations.is_revoked(f"fam:{family}"):
+        raise get_user_exception()
+
+    if not await revocations.revoke(f"jti:{jti}", payload["exp"]):
+        # An already rotated token came back: assume it leaked and end the whole session
+        await revocations.revoke(f"fam:{family}", time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+        raise get_user_exception()
+
+    return issue_tokens(payload["sub"], family)
+
 
-    return {"access_token": token, "token_type": "bearer"}
+@router.post("/logout")
+async def logout(body: RefreshRequest):
+    # Revokes the session the refresh token belongs to; its access token runs out on its own
+    payload = decode_refresh_token(body.refresh_token)
+    await revocations.revoke(f"fam:{payload.get('fam')}", time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    return {"message": "Logged out"}
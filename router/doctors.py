@@ -1,53 +1,118 @@
-from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+
+from fastapi import HTTPException, Depends, Body, File, Query, UploadFile
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import schemas
-from schemas import DoctorCreate
-from database import get_db
+from schemas import DoctorCreate, DoctorUpdate, BulkResponse, DoctorOut, DoctorPage
+from database import get_async_db
+from bulk import check_size, read_csv, bulk_create, bulk_update, bulk_delete
+from search import MAX_SEARCH_RESULTS, search_statement, run_search
+from record_cache import record_cache, as_dict
+from router.auth import get_current_user
 from fastapi import APIRouter
-# Create the database tables
-
-# schemas.Base.metadata.create_all(bind=engine)
 
 router = APIRouter(
     prefix="/doctors",
     tags=["doctors"],
+    dependencies=[Depends(get_current_user)],
 )
 
 
-@router.post("/doctor/")
-def create_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
+@router.post("/doctor/", response_model=DoctorOut)
+async def create_doctor(doctor: DoctorCreate, db: AsyncSession = Depends(get_async_db)):
     new_doctor = schemas.Doctor(name=doctor.name, specialty=doctor.specialty)
     db.add(new_doctor)
-    db.commit()
-    db.refresh(new_doctor)
+    await db.commit()
+    await db.refresh(new_doctor)
     return new_doctor
 
 
-@router.get("/doctor/{doctor_id}")
-def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    db_doctor = db.query(schemas.Doctor).filter(schemas.Doctor.id == doctor_id).first()
+@router.get("/doctor/{doctor_id}", response_model=DoctorOut)
+async def get_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
+    cached = await record_cache.get("doctor", doctor_id)
+    if cached is not None:
+        return cached
+
+    db_doctor = await db.get(schemas.Doctor, doctor_id)
     if not db_doctor:
         raise HTTPException(status_code=404, detail="Doctor not found in database")
+
+    await record_cache.set("doctor", doctor_id, as_dict(db_doctor))
     return db_doctor
 
 
-@router.put("/doctor_id/{id}")
-def update_doctor(id: int, updated_data: DoctorCreate, db: Session = Depends(get_db)):
-    db_doctor = db.query(schemas.Doctor).filter(schemas.Doctor.id == id).first()
+@router.get("/search", response_model=DoctorPage)
+async def search_doctors(
+    name: Optional[str] = Query(None, min_length=1, max_length=100, description="Name or start of the name"),
+    mode: Literal["prefix", "fuzzy"] = Query("prefix", description="prefix: name starts with, fuzzy: similar names, best match first"),
+    specialty: Optional[str] = Query(None, max_length=100, description="Exact specialty"),
+    after_id: int = Query(0, ge=0, description="The previous next_cursor (not used by fuzzy searches)"),
+    limit: int = Query(20, gt=0, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    filters = (schemas.Doctor.specialty == specialty,) if specialty is not None else ()
+
+    statement, paginated = search_statement(schemas.Doctor, name, mode, filters, after_id, limit)
+    doctors, next_cursor = await run_search(db, statement, paginated, limit)
+    return {"doctors": doctors, "next_cursor": next_cursor}
+
+
+@router.put("/doctor_id/{id}", response_model=DoctorOut)
+async def update_doctor(id: int, updated_data: DoctorCreate, db: AsyncSession = Depends(get_async_db)):
+    # Single UPDATE ... RETURNING instead of SELECT, UPDATE and refresh
+    result = await db.execute(
+        update(schemas.Doctor)
+        .where(schemas.Doctor.id == id)
+        .values(name=updated_data.name, specialty=updated_data.specialty)
+        .returning(*schemas.Doctor.__table__.c)
+    )
+    db_doctor = result.mappings().first()
     if not db_doctor:
         raise HTTPException(status_code=404, detail="Doctor not found in database")
-    db_doctor.name = updated_data.name
-    db_doctor.specialty = updated_data.specialty
-    db.commit()
-    db.refresh(db_doctor)
+    await db.commit()
+    await record_cache.invalidate("doctor", id)
     return db_doctor
 
 
 @router.delete("/doctor_id/{id}")
-def delete_doctor(id: int, db: Session = Depends(get_db)):
-    db_doctor = db.query(schemas.Doctor).filter(schemas.Doctor.id == id).first()
-    if not db_doctor:
+async def delete_doctor(id: int, db: AsyncSession = Depends(get_async_db)):
+    # Single DELETE ... RETURNING instead of SELECT then DELETE
+    result = await db.execute(delete(schemas.Doctor).where(schemas.Doctor.id == id).returning(schemas.Doctor.id))
+    if result.scalar() is None:
         raise HTTPException(status_code=404, detail="Doctor not found in database")
-    db.delete(db_doctor)
-    db.commit()
+    await db.commit()
+    await record_cache.invalidate("doctor", id)
     return {"detail": "Doctor deleted successfully"}
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def create_doctors_bulk(doctors: List[DoctorCreate], db: AsyncSession = Depends(get_async_db)):
+    check_size(doctors)
+    results = await bulk_create(db, schemas.Doctor, [doctor.model_dump() for doctor in doctors])
+    return {"results": results}
+
+
+@router.post("/bulk/csv", response_model=BulkResponse)
+async def create_doctors_csv(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    rows, results = await read_csv(file, DoctorCreate)
+    check_size(rows)
+    results += await bulk_create(db, schemas.Doctor, [values for _, values in rows], [index for index, _ in rows])
+    results.sort(key=lambda result: result["index"])
+    return {"results": results}
+
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_doctors_bulk(doctors: List[DoctorUpdate], db: AsyncSession = Depends(get_async_db)):
+    check_size(doctors)
+    results = await bulk_update(db, schemas.Doctor, [doctor.model_dump() for doctor in doctors])
+    await record_cache.invalidate("doctor", *(doctor.id for doctor in doctors))
+    return {"results": results}
+
+
+@router.delete("/bulk", response_model=BulkResponse)
+async def delete_doctors_bulk(ids: List[int] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    check_size(ids)
+    results = await bulk_delete(db, schemas.Doctor, ids)
+    await record_cache.invalidate("doctor", *ids)
+    return {"results": results}
@@ -1,11 +1,20 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-from schemas import UserInput
-from schemas import PredictionResponse
-from model.predict import predict_output, model, MODEL_VERSION
-
+import asyncio
+import json
+import time
+from typing import List
 
-# schemas.Base.metadata.create_all(bind=engine)
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter, ValidationError
+from schemas import UserInput
+from schemas import PredictionResponse, BatchPredictionResponse, ModelActivate, ModelCandidate
+from model.predict import predict_batch, BATCH_CHUNK_SIZE
+from model.executor import inference_executor, InferenceBusy
+from model.batcher import micro_batcher
+from model.cache import prediction_cache
+from model.registry import model_registry, ModelNotFound
+from router.auth import get_current_user
 
 
 router = APIRouter(
@@ -13,6 +22,35 @@ router = APIRouter(
     tags=["insurance_premium"],
 )
 
+# Upper bound for the chunk_size query parameter of the batch endpoint
+MAX_BATCH_CHUNK_SIZE = 10000
+
+# Most records accepted by one batch request, larger backfills are split by the client
+MAX_BATCH_RECORDS = 10000
+
+user_input_list = TypeAdapter(List[UserInput])
+
+# Running shadow predictions, referenced so they are not garbage collected mid-run
+shadow_tasks = set()
+
+
+def batch_chunks_in_flight():
+    # Enough chunks of one batch to keep every inference worker busy,
+    # and at most half of INFERENCE_MAX_PENDING so single predictions still get in
+    return max(1, min(inference_executor.workers, inference_executor.max_pending // 2))
+
+
+def build_user_input(data: UserInput) -> dict:
+    # Only the derived features are sent to the model
+    return {
+        'bmi': data.bmi,
+        'age_group': data.age_group,
+        'lifestyle_risk': data.lifestyle_risk,
+        'city_tier': data.city_tier,
+        'income_lpa': data.income_lpa,
+        'occupation': data.occupation
+    }
+
 
 # human readable
 @router.get('/')
@@ -25,29 +63,225 @@ def home():
 def health_check():
     return {
         'status': 'OK',
-        'version': MODEL_VERSION,
-        'model_loaded': model is not None
+        'version': model_registry.active,
+        'model_loaded': inference_executor.ready,
+        'inference': inference_executor.stats(),
+        'micro_batching': micro_batcher.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'models': model_registry.status()
     }
 
 
+async def shadow_predict(user_input: dict, served: dict, version: str):
+    # Runs the candidate next to the active version, its answer is only compared and timed
+    started = time.perf_counter()
+    try:
+        prediction = await micro_batcher.predict(user_input, model_registry.path(version))
+    except Exception:
+        model_registry.record(version, started, failed=True)
+        return
+    model_registry.record(version, started)
+    model_registry.compare(served, prediction)
+
+
 @router.post('/predict', response_model=PredictionResponse)
-def predict_premium(data: UserInput):
+async def predict_premium(data: UserInput):
 
-    user_input = {
-        'bmi': data.bmi,
-        'age_group': data.age_group,
-        'lifestyle_risk': data.lifestyle_risk,
-        'city_tier': data.city_tier,
-        'income_lpa': data.income_lpa,
-        'occupation': data.occupation
-    }
+    version, shadow = model_registry.route()
+    path = model_registry.path(version)
+    model_file = prediction_cache.model_file(path)
+    user_input = prediction_cache.quantize(build_user_input(data))
+
+    prediction = prediction_cache.get(user_input, model_file)
+    if prediction is not None:
+        return ORJSONResponse(status_code=200, content={'response': prediction})
+
+    started = time.perf_counter()
+    try:
+
+        prediction = await micro_batcher.predict(user_input, path)
+        model_registry.record(version, started)
+        prediction_cache.set(user_input, prediction, model_file)
+
+        if shadow is not None:
+            task = asyncio.create_task(shadow_predict(user_input, prediction, shadow))
+            shadow_tasks.add(task)
+            task.add_done_callback(shadow_tasks.discard)
+
+        return ORJSONResponse(status_code=200, content={'response': prediction})
+
+    except InferenceBusy as e:
 
+        raise HTTPException(status_code=503, detail=str(e))
+
+    except Exception as e:
+
+        model_registry.record(version, started, failed=True)
+        return ORJSONResponse(status_code=500, content=str(e))
+
+
+@router.post(
+    '/predict/batch',
+    response_model=BatchPredictionResponse,
+    openapi_extra={
+        'requestBody': {
+            'required': True,
+            'content': {
+                'application/json': {
+                    'schema': {'type': 'array', 'items': {'$ref': '#/components/schemas/UserInput'}}
+                },
+                'application/x-ndjson': {
+                    'schema': {'type': 'string', 'description': 'One UserInput JSON object per line'}
+                },
+            },
+        }
+    },
+)
+async def predict_premium_batch(
+    request: Request,
+    chunk_size: int = Query(BATCH_CHUNK_SIZE, gt=0, le=MAX_BATCH_CHUNK_SIZE),
+):
+    """
+    Predict a list of inputs sent either as a JSON array
+    or as NDJSON (one JSON object per line).
+    """
+    body = await request.body()
+    content_type = request.headers.get('content-type', '')
+
+    try:
+        if 'ndjson' in content_type:
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            records = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([{
+            'type': 'json_invalid',
+            'loc': ('body', e.pos),
+            'msg': 'JSON decode error',
+            'input': {},
+            'ctx': {'error': e.msg},
+        }])
+
+    if isinstance(records, list) and len(records) > MAX_BATCH_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_RECORDS} records are allowed per batch request")
+
+    try:
+        inputs = user_input_list.validate_python(records)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, 'loc': ('body', *error['loc'])} for error in e.errors(include_url=False)]
+        )
+
+    user_inputs = [prediction_cache.quantize(build_user_input(data)) for data in inputs]
+
+    # Batches are always answered by the active version
+    model_registry.sync()
+    path = model_registry.path(model_registry.active)
+    model_file = prediction_cache.model_file(path)
+
+    # Only rows that are not cached go to the model
+    predictions = [prediction_cache.get(user_input, model_file) for user_input in user_inputs]
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+
+    try:
+
+        if missing:
+            # One executor task per chunk, so the chunks spread over the inference workers.
+            # Only a few run at once, so a long batch never fills INFERENCE_MAX_PENDING by itself
+            rows = [user_inputs[i] for i in missing]
+            in_flight = asyncio.Semaphore(batch_chunks_in_flight())
+
+            async def run_chunk(start: int):
+                async with in_flight:
+                    return await inference_executor.run(predict_batch, rows[start:start + chunk_size], chunk_size, path)
+
+            tasks = [asyncio.ensure_future(run_chunk(start)) for start in range(0, len(rows), chunk_size)]
+            try:
+                chunks = await asyncio.gather(*tasks)
+            except BaseException:
+                # The answer is lost anyway, do not start the chunks still waiting
+                for task in tasks:
+                    task.cancel()
+                raise
+
+            fresh = [prediction for chunk in chunks for prediction in chunk]
+            for i, prediction in zip(missing, fresh):
+                predictions[i] = prediction
+                prediction_cache.set(user_inputs[i], prediction, model_file)
+
+        return ORJSONResponse(status_code=200, content={'responses': predictions})
+
+    except InferenceBusy as e:
+
+        raise HTTPException(status_code=503, detail=str(e))
+
+    except Exception as e:
+
+        return ORJSONResponse(status_code=500, content=str(e))
+
+
+@router.get('/models', dependencies=[Depends(get_current_user)])
+def list_models():
+    return model_registry.status()
+
+
+@router.post('/models/reload', dependencies=[Depends(get_current_user)])
+def reload_models():
+    """
+    Pick up model files added to or replaced in MODEL_DIR, without a restart.
+    """
+    model_registry.sync(force=True)
     try:
+        model_registry.scan()
+    except ModelNotFound as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-        prediction = predict_output(user_input)
+    # Entries made by files that were replaced can no longer be hit, free them
+    prediction_cache.clear()
+    # The other server processes rescan too
+    model_registry.publish()
+    return model_registry.status()
 
-        return JSONResponse(status_code=200, content={'response': prediction})
 
+@router.post('/models/activate', dependencies=[Depends(get_current_user)])
+async def activate_model(body: ModelActivate):
+    """
+    Load a version in every inference worker, then make it the active one.
+    Requests already running finish on the version they started with.
+    Other server processes switch within MODEL_STATE_POLL_SECONDS and load it on first use.
+    """
+    # Start from what the other server processes serve, not from this one's last poll
+    model_registry.sync(force=True)
+    try:
+        path = model_registry.path(body.version)
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        await inference_executor.warmup(path)
     except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not load model {body.version}: {e}")
+
+    model_registry.activate(body.version)
+    model_registry.publish()
+    return model_registry.status()
+
+
+@router.post('/models/candidate', dependencies=[Depends(get_current_user)])
+async def set_candidate_model(body: ModelCandidate):
+    """
+    Route a fraction of /predict traffic to a candidate version (canary),
+    or run it next to the active version and compare answers (shadow).
+    """
+    model_registry.sync(force=True)
+    if body.version is not None:
+        try:
+            await inference_executor.preload(model_registry.path(body.version))
+        except ModelNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not load model {body.version}: {e}")
 
-        return JSONResponse(status_code=500, content=str(e))
+    model_registry.set_candidate(body.version, body.fraction, body.mode)
+    model_registry.publish()
+    return model_registry.status()
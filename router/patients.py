@@ -1,64 +1,182 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from database import get_db
+from typing import List, Literal, Optional
+
+import orjson
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Body, File, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, stream_rows
 import schemas
-from schemas import PatientCreate
-# Create the database tables
-# schemas.Base.metadata.create_all(bind=engine)
+from schemas import PatientCreate, PatientUpdate, BulkResponse, PatientOut, PatientList, PatientPage, PatientUpdateResponse
+from bulk import check_size, read_csv, bulk_create, bulk_update, bulk_delete
+from search import MAX_SEARCH_RESULTS, search_statement, run_search
+from record_cache import record_cache, as_dict
+from router.auth import get_current_user
 
 
 router = APIRouter(
     prefix="/patients",
     tags=["patients"],
+    dependencies=[Depends(get_current_user)],
 )
 
+# Largest page the keyset-paginated listing returns
+MAX_PAGE_SIZE = 1000
 
-@router.post("/patient/")
-def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
+
+@router.post("/patient/", response_model=PatientOut)
+async def create_patient(patient: PatientCreate, db: AsyncSession = Depends(get_async_db)):
     new_patient = schemas.Patient(name=patient.name, age=patient.age, weight=patient.weight, height=patient.height)
     db.add(new_patient)
-    db.commit()
-    db.refresh(new_patient)
+    await db.commit()
+    await db.refresh(new_patient)
     return new_patient
 
 
-@router.get("/patient/{patient_id}")
-def get_patient(patient_id: int, db: Session = Depends(get_db)):
-    db_patient = db.query(schemas.Patient).filter(schemas.Patient.id == patient_id).first()
+@router.get("/patient/{patient_id}", response_model=PatientOut)
+async def get_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    cached = await record_cache.get("patient", patient_id)
+    if cached is not None:
+        return cached
+
+    db_patient = await db.get(schemas.Patient, patient_id)
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found in database")
+
+    await record_cache.set("patient", patient_id, as_dict(db_patient))
     return db_patient
 
 
-@router.get("/patients_list/{limit}")
-def get_patients(limit: int, db: Session = Depends(get_db)):
-    patients = db.query(schemas.Patient).limit(limit).all()
+@router.get("/patients_list/{limit}", response_model=PatientList, deprecated=True)
+async def get_patients(limit: int, db: AsyncSession = Depends(get_async_db)):
+    patients = (await db.scalars(select(schemas.Patient).limit(limit))).all()
     return {"patients": patients}
 
 
-@router.put("/patient_id/{id}")
-def update_patient(id: int, updated_data: PatientCreate, db: Session = Depends(get_db)):
-    db_patient = db.query(schemas.Patient).filter(schemas.Patient.id == id).first()
+@router.get("/patients_list", response_model=PatientPage)
+async def list_patients(
+    after_id: int = Query(0, ge=0, description="Return patients with an id greater than this (the previous next_cursor)"),
+    limit: int = Query(100, gt=0, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Keyset pagination: the id index makes every page as cheap as the first
+    statement = (
+        select(schemas.Patient)
+        .where(schemas.Patient.id > after_id)
+        .order_by(schemas.Patient.id)
+        .limit(limit)
+    )
+    patients = (await db.scalars(statement)).all()
+    next_cursor = patients[-1].id if len(patients) == limit else None
+    return {"patients": patients, "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=PatientPage)
+async def search_patients(
+    name: Optional[str] = Query(None, min_length=1, max_length=100, description="Name or start of the name"),
+    mode: Literal["prefix", "fuzzy"] = Query("prefix", description="prefix: name starts with, fuzzy: similar names, best match first"),
+    min_age: Optional[int] = Query(None, ge=0),
+    max_age: Optional[int] = Query(None, ge=0),
+    after_id: int = Query(0, ge=0, description="The previous next_cursor (not used by fuzzy searches)"),
+    limit: int = Query(20, gt=0, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    filters = []
+    if min_age is not None:
+        filters.append(schemas.Patient.age >= min_age)
+    if max_age is not None:
+        filters.append(schemas.Patient.age <= max_age)
+
+    statement, paginated = search_statement(schemas.Patient, name, mode, tuple(filters), after_id, limit)
+    patients, next_cursor = await run_search(db, statement, paginated, limit)
+    return {"patients": patients, "next_cursor": next_cursor}
+
+
+@router.get("/patients_export")
+async def export_patients():
+    """
+    Stream every patient as NDJSON (one JSON object per line) in constant memory.
+    """
+    statement = select(
+        schemas.Patient.id,
+        schemas.Patient.name,
+        schemas.Patient.age,
+        schemas.Patient.weight,
+        schemas.Patient.height,
+    ).order_by(schemas.Patient.id)
+
+    async def generate():
+        async for row in stream_rows(statement):
+            yield orjson.dumps(row._asdict()) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.put("/patient_id/{id}", response_model=PatientUpdateResponse)
+async def update_patient(id: int, updated_data: PatientCreate, db: AsyncSession = Depends(get_async_db)):
+    # Single UPDATE ... RETURNING instead of SELECT, UPDATE and refresh
+    result = await db.execute(
+        update(schemas.Patient)
+        .where(schemas.Patient.id == id)
+        .values(name=updated_data.name, age=updated_data.age)
+        .returning(*schemas.Patient.__table__.c)
+    )
+    db_patient = result.mappings().first()
 
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    db_patient.name = updated_data.name
-    db_patient.age = updated_data.age
-
-    db.commit()
-    db.refresh(db_patient)
+    await db.commit()
+    await record_cache.invalidate("patient", id)
     return {"message": "Update successful", "patient": db_patient}
 
 
 @router.delete("/patient_id/{id}")
-def delete_patient(id: int, name: str, db: Session = Depends(get_db)):
-    db_patient = db.query(schemas.Patient).filter(schemas.Patient.id == id).first()
-    db_patient = db.query(schemas.Patient).filter(schemas.Patient.name == name).first()
-
-    if not db_patient:
+async def delete_patient(id: int, name: str, db: AsyncSession = Depends(get_async_db)):
+    # Single DELETE ... RETURNING, the name has to match the patient with this id
+    result = await db.execute(
+        delete(schemas.Patient)
+        .where(schemas.Patient.id == id, schemas.Patient.name == name)
+        .returning(schemas.Patient.id)
+    )
+    deleted_id = result.scalar()
+
+    if deleted_id is None:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    db.delete(db_patient)
-    db.commit()
+    await db.commit()
+    await record_cache.invalidate("patient", id)
     return {"message": "Deletion successful", "id_deleted": id}
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def create_patients_bulk(patients: List[PatientCreate], db: AsyncSession = Depends(get_async_db)):
+    check_size(patients)
+    results = await bulk_create(db, schemas.Patient, [patient.model_dump() for patient in patients])
+    return {"results": results}
+
+
+@router.post("/bulk/csv", response_model=BulkResponse)
+async def create_patients_csv(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    rows, results = await read_csv(file, PatientCreate)
+    check_size(rows)
+    results += await bulk_create(db, schemas.Patient, [values for _, values in rows], [index for index, _ in rows])
+    results.sort(key=lambda result: result["index"])
+    return {"results": results}
+
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_patients_bulk(patients: List[PatientUpdate], db: AsyncSession = Depends(get_async_db)):
+    check_size(patients)
+    results = await bulk_update(db, schemas.Patient, [patient.model_dump() for patient in patients])
+    await record_cache.invalidate("patient", *(patient.id for patient in patients))
+    return {"results": results}
+
+
+@router.delete("/bulk", response_model=BulkResponse)
+async def delete_patients_bulk(ids: List[int] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    check_size(ids)
+    results = await bulk_delete(db, schemas.Patient, ids)
+    await record_cache.invalidate("patient", *ids)
+    return {"results": results}
@@ -1,17 +1,30 @@
 # this is the file where we define our database models
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Float, Index, Integer, String
 from database import Base
 from pydantic import BaseModel, Field, computed_field, field_validator
-from typing import Annotated, Literal, Dict
-from database import tier_1_cities, tier_2_cities
+from typing import Annotated, Literal, Dict, List, Optional
+from functools import cached_property
+from cities import get_city_tier
+
+
+def trigram_index(name: str, column: str):
+    # GIN trigram index for prefix and fuzzy name search, PostgreSQL only (needs pg_trgm, see migrations/)
+    return Index(
+        name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+    ).ddl_if(dialect="postgresql")
 
 
 # Define the Patient model table
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        trigram_index("ix_patients_name_trgm", "name"),
+        # age range filter with keyset pagination on id
+        Index("ix_patients_age_id", "age", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
     age = Column(Integer)
     weight = Column(Integer)
     height = Column(Integer)
@@ -20,25 +33,34 @@ class Patient(Base):
 # Define the Doctor model table
 class Doctor(Base):
     __tablename__ = "doctors"
+    __table_args__ = (
+        trigram_index("ix_doctors_name_trgm", "name"),
+        # specialty filter with keyset pagination on id, covering so PostgreSQL can answer from the index alone
+        Index("ix_doctors_specialty_id", "specialty", "id", postgresql_include=["name"]),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    specialty = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    specialty = Column(String)
 
 
 # Define the Admin model table
-# class Admin(Base):
-#     __tablename__ = "admin"
-#     username = Column(String, primary_key=True, index=True)
-#     hashed_pass = Column(String, index=True)
-# # In schemas.py
 class Admin(Base):
     __tablename__ = "admins"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True)
+    id = Column(Integer, primary_key=True)
+    # unique index, used by every login
+    username = Column(String, unique=True, index=True)
     hashed_pass = Column(String)  # Make sure this matches admin_value.hashed_pass
 
 
+# Revoked refresh tokens ("jti:<id>") and login sessions ("fam:<id>"), shared by all server processes
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    key = Column(String, primary_key=True)
+    # unix time after which the token is expired anyway and the row can be deleted
+    expires_at = Column(Float, nullable=False, index=True)
+
+
 # Pydantic models for data validation and serialization
 class PatientCreate(BaseModel):
     name: str
@@ -59,6 +81,67 @@ class DoctorCreate(BaseModel):
         from_attributes = True
 
 
+# Pydantic models for responses, serialized by pydantic-core straight from the ORM objects
+class PatientOut(BaseModel):
+    id: int
+    name: Optional[str] = None
+    age: Optional[int] = None
+    weight: Optional[float] = None
+    height: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PatientList(BaseModel):
+    patients: List[PatientOut]
+
+
+class PatientPage(BaseModel):
+    patients: List[PatientOut]
+    next_cursor: Optional[int] = None
+
+
+class PatientUpdateResponse(BaseModel):
+    message: str
+    patient: PatientOut
+
+
+class DoctorOut(BaseModel):
+    id: int
+    name: Optional[str] = None
+    specialty: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DoctorPage(BaseModel):
+    doctors: List[DoctorOut]
+    next_cursor: Optional[int] = None
+
+
+# Pydantic models for bulk updates (the id says which row to change)
+class PatientUpdate(PatientCreate):
+    id: int
+
+
+class DoctorUpdate(DoctorCreate):
+    id: int
+
+
+# Pydantic models for bulk write results, one entry per input row
+class BulkRowResult(BaseModel):
+    index: int
+    status: Literal['created', 'updated', 'deleted', 'not_found', 'invalid']
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkRowResult]
+
+
 # pydantic model to validate incoming data
 class UserInput(BaseModel):
 
@@ -76,13 +159,14 @@ class UserInput(BaseModel):
         v = v.strip().title()
         return v
 
+    # Derived fields are computed once per instance (lifestyle_risk reads bmi twice)
     @computed_field
-    @property
+    @cached_property
     def bmi(self) -> float:
         return self.weight/(self.height**2)
 
     @computed_field
-    @property
+    @cached_property
     def lifestyle_risk(self) -> str:
         if self.smoker and self.bmi > 30:
             return "high"
@@ -92,7 +176,7 @@ class UserInput(BaseModel):
             return "low"
 
     @computed_field
-    @property
+    @cached_property
     def age_group(self) -> str:
         if self.age < 25:
             return "young"
@@ -103,14 +187,9 @@ class UserInput(BaseModel):
         return "senior"
 
     @computed_field
-    @property
+    @cached_property
     def city_tier(self) -> int:
-        if self.city in tier_1_cities:
-            return 1
-        elif self.city in tier_2_cities:
-            return 2
-        else:
-            return 3
+        return get_city_tier(self.city)
 
 
 # Pydantic model for prediction response
@@ -130,3 +209,22 @@ class PredictionResponse(BaseModel):
         description="Probability distribution across all possible classes",
         example={"Low": 0.01, "Medium": 0.15, "High": 0.84}
     )
+
+
+# Pydantic model for batch prediction response
+class BatchPredictionResponse(BaseModel):
+    responses: List[PredictionResponse] = Field(
+        ...,
+        description="One prediction per input record, in the same order as the request"
+    )
+
+
+# Pydantic models for switching model versions
+class ModelActivate(BaseModel):
+    version: str = Field(..., description="Model version that should serve traffic")
+
+
+class ModelCandidate(BaseModel):
+    version: Optional[str] = Field(None, description="Candidate model version, null stops the canary/shadow")
+    fraction: float = Field(0.05, ge=0, le=1, description="Share of /predict requests routed to the candidate")
+    mode: Literal['canary', 'shadow'] = Field('canary', description="canary answers with the candidate, shadow only compares")
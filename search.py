@@ -0,0 +1,47 @@
+# this is the file where we build the directory search queries shared by the patient and doctor routers
+from sqlalchemy import func, select
+
+from database import DB_DIALECT
+
+# Largest page a search returns
+MAX_SEARCH_RESULTS = 100
+
+SEARCH_MODES = ("prefix", "fuzzy")
+
+
+def escape_like(value: str):
+    # The search text is matched literally, % and _ typed by the user are not wildcards
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_statement(model, name: str = None, mode: str = "prefix", filters: tuple = (),
+                     after_id: int = 0, limit: int = MAX_SEARCH_RESULTS):
+    """
+    SELECT for a name search plus extra filters, keyset-paginated on id.
+    prefix: case-insensitive "starts with". fuzzy: pg_trgm similarity on PostgreSQL,
+    best matches first (one page only); "contains" on other databases.
+    Both use the trigram index on PostgreSQL, the filters use the composite (filter, id) indexes.
+    """
+    statement = select(model).where(*filters)
+    ranked = False
+
+    if name:
+        if mode == "prefix":
+            statement = statement.where(model.name.ilike(escape_like(name) + "%", escape="\\"))
+        elif DB_DIALECT == "postgresql":
+            statement = statement.where(model.name.op("%")(name))
+            ranked = True
+        else:
+            statement = statement.where(model.name.ilike("%" + escape_like(name) + "%", escape="\\"))
+
+    if ranked:
+        return statement.order_by(func.similarity(model.name, name).desc(), model.id).limit(limit), False
+
+    return statement.where(model.id > after_id).order_by(model.id).limit(limit), True
+
+
+async def run_search(db, statement, paginated: bool, limit: int):
+    # Returns (rows, next_cursor)
+    rows = (await db.scalars(statement)).all()
+    next_cursor = rows[-1].id if paginated and len(rows) == limit else None
+    return rows, next_cursor
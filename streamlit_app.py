@@ -1,3 +1,5 @@
+import time
+
 import streamlit as st
 import requests
 
@@ -9,6 +11,33 @@ if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 if "token" not in st.session_state:
     st.session_state.token = None
+if "refresh_token" not in st.session_state:
+    st.session_state.refresh_token = None
+if "token_expires_at" not in st.session_state:
+    st.session_state.token_expires_at = 0
+
+
+def store_tokens(data):
+    st.session_state.token = data["access_token"]
+    st.session_state.refresh_token = data["refresh_token"]
+    st.session_state.token_expires_at = time.time() + data["expires_in"]
+
+
+def auth_headers():
+    # Patient and doctor routes need the token from /admin/token.
+    # Renew it with the refresh token shortly before it expires instead of logging in again.
+    if st.session_state.refresh_token and time.time() > st.session_state.token_expires_at - 60:
+        try:
+            response = requests.post(
+                f"{API_URL}/admin/refresh",
+                json={"refresh_token": st.session_state.refresh_token}
+            )
+            if response.status_code == 200:
+                store_tokens(response.json())
+        except:
+            pass
+    return {"Authorization": f"Bearer {st.session_state.token}"}
+
 
 # Page Title
 st.title("🏥 Hospital Management System")
@@ -30,8 +59,7 @@ if not st.session_state.logged_in:
                     data={"username": username, "password": password}
                 )
                 if response.status_code == 200:
-                    data = response.json()
-                    st.session_state.token = data["access_token"]
+                    store_tokens(response.json())
                     st.session_state.logged_in = True
                     st.success("Login successful!")
                     st.rerun()
@@ -61,8 +89,13 @@ if not st.session_state.logged_in:
 else:
     # Logout Button
     if st.button("Logout"):
+        try:
+            requests.post(f"{API_URL}/admin/logout", json={"refresh_token": st.session_state.refresh_token})
+        except:
+            pass
         st.session_state.logged_in = False
         st.session_state.token = None
+        st.session_state.refresh_token = None
         st.rerun()
     
     st.success(f"✅ Logged in")
@@ -90,6 +123,7 @@ else:
                 try:
                     response = requests.post(
                         f"{API_URL}/patients/patient/",
+                        headers=auth_headers(),
                         json={"name": name, "age": int(age), "weight": float(weight), "height": float(height)}
                     )
                     if response.status_code == 200:
@@ -107,7 +141,7 @@ else:
             
             if st.button("Get Patient"):
                 try:
-                    response = requests.get(f"{API_URL}/patients/patient/{int(patient_id)}")
+                    response = requests.get(f"{API_URL}/patients/patient/{int(patient_id)}", headers=auth_headers())
                     if response.status_code == 200:
                         patient = response.json()
                         st.success("Patient found!")
@@ -133,6 +167,7 @@ else:
                 try:
                     response = requests.put(
                         f"{API_URL}/patients/patient_id/{int(patient_id)}",
+                        headers=auth_headers(),
                         json={"name": name, "age": int(age), "weight": float(weight), "height": float(height)}
                     )
                     if response.status_code == 200:
@@ -153,6 +188,7 @@ else:
                 try:
                     response = requests.delete(
                         f"{API_URL}/patients/patient_id/{int(patient_id)}",
+                        headers=auth_headers(),
                         params={"name": name}
                     )
                     if response.status_code == 200:
@@ -178,6 +214,7 @@ else:
                 try:
                     response = requests.post(
                         f"{API_URL}/doctors/doctor/",
+                        headers=auth_headers(),
                         json={"name": name, "specialty": specialty}
                     )
                     if response.status_code == 200:
@@ -195,7 +232,7 @@ else:
             
             if st.button("Get Doctor"):
                 try:
-                    response = requests.get(f"{API_URL}/doctors/doctor/{int(doctor_id)}")
+                    response = requests.get(f"{API_URL}/doctors/doctor/{int(doctor_id)}", headers=auth_headers())
                     if response.status_code == 200:
                         doctor = response.json()
                         st.success("Doctor found!")
@@ -217,6 +254,7 @@ else:
                 try:
                     response = requests.put(
                         f"{API_URL}/doctors/doctor_id/{int(doctor_id)}",
+                        headers=auth_headers(),
                         json={"name": name, "specialty": specialty}
                     )
                     if response.status_code == 200:
@@ -234,7 +272,7 @@ else:
             
             if st.button("Delete Doctor", type="primary"):
                 try:
-                    response = requests.delete(f"{API_URL}/doctors/doctor_id/{int(doctor_id)}")
+                    response = requests.delete(f"{API_URL}/doctors/doctor_id/{int(doctor_id)}", headers=auth_headers())
                     if response.status_code == 200:
                         st.success("Doctor deleted!")
                     else:
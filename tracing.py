@@ -0,0 +1,184 @@
+# this is the file where we trace requests, time SQL statements and profile single requests
+import contextlib
+import logging
+import os
+import sys
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# "none", "console" (stdout) or "file" (one JSON span per line in TRACING_FILE), needs opentelemetry-sdk
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+
+# Statements slower than this are logged with their SQL, 0 turns the log off
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Set PROFILING_ENABLED=1 to let admins profile a request by sending "X-Profile: 1", needs pyinstrument
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+# Longest SQL text written to the slow-query log and to span attributes
+MAX_STATEMENT_LENGTH = 500
+
+
+def create_provider(exporter: str):
+    if exporter == "none":
+        return None
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporter == "console":
+        out = sys.stdout
+    elif exporter == "file":
+        out = open(TRACING_FILE, "a")
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "hospital-management-api"}))
+    span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    return provider
+
+
+provider = create_provider(TRACING_EXPORTER)
+tracer = provider.get_tracer(__name__) if provider is not None else None
+
+
+def shutdown():
+    # Writes out the spans still buffered by the batch processor
+    if provider is not None:
+        provider.shutdown()
+
+
+def span(name: str, **attributes):
+    # A child of the current request span, or a no-op when tracing is off
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append((time.perf_counter(), time.time_ns()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started, started_ns = conn.info["query_start"].pop()
+    elapsed = time.perf_counter() - started
+
+    if tracer is not None:
+        # Created after the fact with the real start time, under whatever span is current
+        statement_span = tracer.start_span(
+            "db.statement",
+            start_time=started_ns,
+            attributes={"db.statement": statement[:MAX_STATEMENT_LENGTH], "db.executemany": executemany},
+        )
+        statement_span.end()
+
+    # Parameters are left out on purpose, they hold patient data
+    if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement[:MAX_STATEMENT_LENGTH])
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.execution_context is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def instrument_engine(engine):
+    # Works for sync engines and for the sync_engine behind an AsyncEngine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class TracingMiddleware:
+    """
+    One span per request, named after the route template. Pool checkouts,
+    SQL statements and model inference show up as its children, the rest of
+    the span is handler code, ORM hydration and serialization.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                request_span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with tracer.start_as_current_span(
+            scope["method"], attributes={"http.method": scope["method"], "http.target": scope["path"]}
+        ) as request_span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    request_span.update_name(f"{scope['method']} {route.path}")
+                    request_span.set_attribute("http.route", route.path)
+
+
+class ProfilingMiddleware:
+    """
+    Runs pyinstrument over one request when an admin sends "X-Profile: 1"
+    and answers with the HTML profile instead of the normal response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Imported here, the auth router itself imports the database module that imports this one
+        from fastapi import HTTPException
+        from fastapi.responses import HTMLResponse, ORJSONResponse
+        from router.auth import get_current_user
+
+        token = self._bearer_token(scope)
+        try:
+            if token is None:
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            await get_current_user(token)
+        except HTTPException as e:
+            response = ORJSONResponse(status_code=e.status_code, content={"detail": e.detail})
+            await response(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+
+        async def discard(message):
+            pass
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        await HTMLResponse(profiler.output_html())(scope, receive, send)
+
+    @staticmethod
+    def _requested(scope):
+        return any(name == b"x-profile" and value == b"1" for name, value in scope["headers"])
+
+    @staticmethod
+    def _bearer_token(scope):
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value.lower().startswith(b"bearer "):
+                return value[7:].decode("latin-1")
+        return None